@@ -0,0 +1,53 @@
+"""Compare schemabuilder format checkers with the jsonschema defaults.
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/formats.py
+
+Formats jsonschema can't check without an optional dependency (e.g.
+`uri` without `rfc3987`) are reported as unsupported.
+
+"""
+import timeit
+
+import jsonschema
+
+from schemabuilder import formats
+
+
+SAMPLES = {
+    "email": ["bob@example.com", "bob.smith+tag@mail.example.co.uk", "bob"],
+    "uri": ["http://example.com/a/b?c=d#e", "urn:isbn:0451450523", "a b"],
+    "date-time": [
+        "2024-02-29T10:00:00Z", "2024-01-01T10:00:00.123+02:00", "2024-01-01",
+    ],
+    "ipv4": ["192.168.0.1", "10.0.0.255", "256.0.0.1"],
+    "ipv6": ["::1", "2001:db8::8a2e:370:7334", "1::2::3"],
+    "hostname": ["example.com", "a-b.c.example.org", "-bad.example.com"],
+}
+
+
+def measure(checker, format, samples, number=20000):
+    """Return the time of one check, in microseconds."""
+    def run():
+        for sample in samples:
+            checker.conforms(sample, format)
+    best = min(timeit.repeat(run, number=number, repeat=3))
+    return best / number / len(samples) * 1e6
+
+
+def main():
+    default = jsonschema.FormatChecker()
+    print("%-10s %14s %14s" % ("format", "schemabuilder", "jsonschema"))
+    for format in sorted(SAMPLES):
+        samples = SAMPLES[format]
+        ours = measure(formats.checker, format, samples)
+        if format in default.checkers:
+            theirs = "%11.2f us" % measure(default, format, samples)
+        else:
+            theirs = "unsupported"
+        print("%-10s %11.2f us %14s" % (format, ours, theirs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Measure the memory used by schema primitives.
+
+The size of the nodes is reported before and after serializing them:
+nodes memoizing their dict hold on to it.
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/memory.py [nodes]
+
+"""
+import gc
+import sys
+import weakref
+
+import schemabuilder as jsb
+
+
+def build(count):
+    """Build `count` objects with a few typical properties each."""
+    nodes = []
+    for i in range(count // 5):
+        name = jsb.Str(min=1, max=64)
+        email = jsb.Str(format="email")
+        age = jsb.Int(min=0)
+        tags = jsb.Array(items=jsb.Str())
+        user = jsb.Object(properties={
+            "name": name(required=True),
+            "email": email,
+            "age": age,
+            "tags": tags,
+        })
+        nodes.append(user)
+    return nodes
+
+
+def node_size(node):
+    """Return the size of a node and of the containers it owns.
+
+    Values shared with other nodes (strings, numbers, other nodes) are
+    not counted.
+
+    """
+    size = sys.getsizeof(node)
+    for name in ("__dict__", "_values"):
+        try:
+            container = object.__getattribute__(node, name)
+        except AttributeError:
+            continue
+        size += sys.getsizeof(container)
+
+    try:
+        parents = object.__getattribute__(node, "_parents")
+    except AttributeError:
+        parents = node.__dict__.get("_parents")
+    if isinstance(parents, weakref.WeakSet):
+        size += sum(sys.getsizeof(o) for o in (
+            parents,
+            parents.__dict__,
+            parents.data,
+            parents._remove,
+            parents._pending_removals,
+        ))
+        size += sum(sys.getsizeof(r) for r in parents.data)
+    elif parents:
+        size += sys.getsizeof(parents)
+        size += sum(sys.getsizeof(r) for r in parents)
+    return size
+
+
+def node_cache(node):
+    try:
+        return object.__getattribute__(node, "_dict_cache")
+    except AttributeError:
+        return getattr(node, "__dict__", {}).get("_dict_cache")
+
+
+def cache_size(node, caches):
+    """Return the size of the dict cached by `node.to_dict()`.
+
+    Only the containers the node owns are counted: the cached dicts of
+    the other nodes it holds are counted with these nodes.
+
+    """
+    cache = node_cache(node)
+    if cache is None:
+        return 0
+    size = 0
+    stack = [cache]
+    while stack:
+        container = stack.pop()
+        size += sys.getsizeof(container)
+        values = (
+            container.values() if isinstance(container, dict) else container
+        )
+        for value in values:
+            if isinstance(value, (dict, list,)) and id(value) not in caches:
+                stack.append(value)
+    return size
+
+
+def walk(nodes):
+    stack = list(nodes)
+    seen = set()
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        yield node
+        for value in (node.properties or {}).values() if isinstance(
+            node, jsb.Object
+        ) else ():
+            stack.append(value)
+        if isinstance(node, jsb.Array) and node.items is not None:
+            stack.append(node.items)
+
+
+def main(count=100000):
+    gc.collect()
+    nodes = build(count)
+    all_nodes = list(walk(nodes))
+    total = sum(node_size(n) for n in all_nodes)
+    print("%d nodes, %d bytes, %.0f bytes per node" % (
+        len(all_nodes), total, float(total) / len(all_nodes),
+    ))
+
+    # nodes memoizing their dict also hold it once serialized.
+    for node in nodes:
+        node.to_dict()
+    caches = set(id(node_cache(n)) for n in all_nodes) - set([id(None)])
+    cached = sum(cache_size(n, caches) for n in all_nodes)
+    print("after to_dict: %d bytes, %.0f bytes per node" % (
+        total + cached, float(total + cached) / len(all_nodes),
+    ))
+    return total, cached, len(all_nodes)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,318 @@
+"""Time the build, serialize and validate hot paths on synthetic schemas.
+
+Schemas of increasing size are built in four shapes: deeply nested
+objects, wide objects, many definitions and long `$ref` chains.
+Validation is timed against valid and invalid payloads from a few bytes
+to a few megabytes.
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/suite.py [--quick] [--save]
+                                              [--compare RESULTS]
+                                              [--filter TEXT]
+
+`--save` writes the results to `benchmarks/results/<commit>.json`;
+`--compare` prints the ratio of each timing to a saved run.
+
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import jsonschema
+
+import schemabuilder as jsb
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "results")
+
+SIZES = (10, 100, 1000)
+QUICK_SIZES = (10, 100)
+
+#: number of records of the payloads, from bytes to megabytes.
+PAYLOADS = (1, 100, 10000)
+QUICK_PAYLOADS = (1, 100)
+
+
+def deep(size):
+    """Return a schema with objects nested `size` levels deep."""
+    node = jsb.Object(properties={"value": jsb.Int(min=0)})
+    for _ in range(size - 1):
+        node = jsb.Object(properties={
+            "value": jsb.Int(min=0),
+            "child": node,
+        })
+    schema = jsb.Schema()
+    schema.define("root", node)
+    return schema, "root"
+
+
+def deep_payload(size):
+    payload = {"value": 1}
+    for _ in range(size - 1):
+        payload = {"value": 1, "child": payload}
+    return payload
+
+
+def wide(size):
+    """Return a schema with an object of `size` properties."""
+    schema = jsb.Schema()
+    schema.define("root", jsb.Object(properties=dict(
+        ("p%d" % i, jsb.Str(max=16, required=(i % 2 == 0)))
+        for i in range(size)
+    )))
+    return schema, "root"
+
+
+def wide_payload(size):
+    return dict(("p%d" % i, "value") for i in range(size))
+
+
+def many(size):
+    """Return a schema of `size` definitions, all used by the root."""
+    schema = jsb.Schema()
+    refs = [
+        schema.define("d%d" % i, jsb.Str(max=16)) for i in range(size)
+    ]
+    schema.define("root", jsb.Object(properties=dict(
+        ("p%d" % i, ref()) for i, ref in enumerate(refs)
+    )))
+    return schema, "root"
+
+
+def chain(size):
+    """Return a schema with a chain of `size` references."""
+    schema = jsb.Schema()
+    ref = schema.define("d0", jsb.Str(max=16))
+    for i in range(1, size):
+        ref = schema.define("d%d" % i, jsb.Array(items=ref(), max=2))
+    return schema, "d%d" % (size - 1)
+
+
+def chain_payload(size):
+    payload = "value"
+    for _ in range(size - 1):
+        payload = [payload]
+    return payload
+
+
+def shared(size):
+    """Return a schema of `size` definitions sharing a primitive."""
+    schema = jsb.Schema()
+    email = jsb.Str(format="email")
+    refs = [
+        schema.define("d%d" % i, jsb.Object(properties={"email": email}))
+        for i in range(size)
+    ]
+    schema.define("root", jsb.Object(properties=dict(
+        ("p%d" % i, ref()) for i, ref in enumerate(refs)
+    )))
+    return schema, "root"
+
+
+def shared_payload(size):
+    return dict(("p%d" % i, {"email": "a@example.com"}) for i in range(size))
+
+
+SHAPES = {
+    "deep": (deep, deep_payload),
+    "wide": (wide, wide_payload),
+    "many": (many, wide_payload),
+    "chain": (chain, chain_payload),
+    "shared": (shared, shared_payload),
+}
+
+
+def user_schema():
+    schema = jsb.Schema()
+    name = schema.define("name", jsb.Str(min=1, max=64))
+    user = schema.define("user", jsb.Object(properties={
+        "name": name(required=True),
+        "email": jsb.Str(format="email"),
+        "age": jsb.Int(min=0),
+        "tags": jsb.Array(items=jsb.Str(), max=8),
+    }))
+    schema.define("users", jsb.Array(items=user()))
+    return schema
+
+
+def users_payload(count, valid=True):
+    users = [
+        {
+            "name": "user%d" % i,
+            "email": "user%d@example.com" % i,
+            "age": i % 100,
+            "tags": ["a", "b", "c"],
+        }
+        for i in range(count)
+    ]
+    if not valid:
+        users[-1]["age"] = -1
+    return users
+
+
+def measure(func, min_time=0.2, repeat=3):
+    """Return the best time of one `func` call, in seconds."""
+    number = 1
+    while True:
+        start = time.time()
+        for _ in range(number):
+            func()
+        duration = time.time() - start
+        if duration >= min_time or number >= 1 << 20:
+            break
+        number *= 10 if duration < min_time / 10 else 2
+
+    best = duration
+    for _ in range(repeat - 1):
+        start = time.time()
+        for _ in range(number):
+            func()
+        best = min(best, time.time() - start)
+    return best / number
+
+
+def shape_benchmarks(sizes):
+    for shape in sorted(SHAPES):
+        build, make_payload = SHAPES[shape]
+        for size in sizes:
+            prefix = "%s.%d." % (shape, size)
+            schema, id = build(size)
+            ref = schema.ref(id)
+            payload = make_payload(size)
+            ref.validate(payload)
+
+            yield prefix + "build", lambda build=build, size=size: build(
+                size
+            )
+
+            def to_dict_cold(build=build, size=size):
+                build(size)[0].to_dict()
+            yield prefix + "build+to_dict", to_dict_cold
+
+            def to_dict_reset(schema=schema):
+                # a new definitions dict resets the schema fragments but
+                # not the primitives caches.
+                schema.definitions = dict(schema.definitions)
+                schema.to_dict()
+            yield prefix + "to_dict.reset", to_dict_reset
+            yield prefix + "to_dict.warm", schema.to_dict
+
+            def define(schema=schema, id=id):
+                schema.define(id, schema.definitions[id])
+                schema.to_dict()
+            yield prefix + "define", define
+
+            def validator(schema=schema, id=id):
+                schema.validator(id)
+            yield prefix + "validator", validator
+
+            def validate(ref=ref, payload=payload):
+                ref.validate(payload)
+            yield prefix + "validate", validate
+
+
+def payload_benchmarks(counts):
+    schema = user_schema()
+    ref = schema.ref("users")
+    compiled = schema.compile("users")
+    for count in counts:
+        for valid in (True, False):
+            payload = users_payload(count, valid)
+            prefix = "payload.%dB.%s." % (
+                len(json.dumps(payload)), "valid" if valid else "invalid",
+            )
+
+            def validate(payload=payload, valid=valid, schema=schema):
+                try:
+                    ref.validate(payload)
+                except jsonschema.ValidationError:
+                    assert not valid
+            yield prefix + "validate", validate
+
+            def is_valid(payload=payload, valid=valid):
+                assert compiled.is_valid(payload) is valid
+            yield prefix + "compiled", is_valid
+
+            def batch(payload=payload, valid=valid):
+                results = schema.validate_batch("user", payload)
+                assert (not any(results)) is valid
+            yield prefix + "batch", batch
+
+
+def run(quick=False, text=None, out=sys.stdout):
+    benchmarks = list(shape_benchmarks(QUICK_SIZES if quick else SIZES))
+    benchmarks.extend(
+        payload_benchmarks(QUICK_PAYLOADS if quick else PAYLOADS)
+    )
+    results = {}
+    for name, func in benchmarks:
+        if text and text not in name:
+            continue
+        results[name] = measure(func, 0.05 if quick else 0.2)
+        out.write("%-40s %12.1f us\n" % (name, results[name] * 1e6))
+        out.flush()
+    return results
+
+
+def commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save(results):
+    if not os.path.isdir(RESULTS_DIR):
+        os.makedirs(RESULTS_DIR)
+    path = os.path.join(RESULTS_DIR, "%s.json" % commit())
+    with open(path, "w") as f:
+        json.dump({
+            "commit": commit(),
+            "python": platform.python_version(),
+            "time": time.time(),
+            "results": results,
+        }, f, indent=2, sort_keys=True)
+    return path
+
+
+def compare(results, path, out=sys.stdout):
+    with open(path) as f:
+        previous = json.load(f)
+    out.write("\nCompared to %s:\n" % previous["commit"])
+    for name in sorted(results):
+        if name not in previous["results"]:
+            continue
+        ratio = results[name] / previous["results"][name]
+        out.write("%-40s %8.2fx\n" % (name, ratio))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller sizes and shorter runs")
+    parser.add_argument("--save", action="store_true",
+                        help="save results in %s" % RESULTS_DIR)
+    parser.add_argument("--compare", metavar="RESULTS",
+                        help="saved results to compare with")
+    parser.add_argument("--filter", metavar="TEXT",
+                        help="only run benchmarks whose name contains TEXT")
+    args = parser.parse_args(argv)
+
+    results = run(args.quick, args.filter)
+    if args.save:
+        sys.stdout.write("Saved to %s\n" % save(results))
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
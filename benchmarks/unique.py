@@ -0,0 +1,63 @@
+"""Time uniqueItems checks on large arrays.
+
+Compares the stock jsonschema validator, compiler.Draft4Validator and
+compiled primitives on arrays of ids, strings and objects, unique or
+with one duplicate at the end.
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/unique.py [size ...]
+
+"""
+import sys
+import time
+
+import jsonschema
+
+import schemabuilder as jsb
+from schemabuilder import compiler
+
+
+def arrays(size):
+    yield "ints", range(size)
+    yield "strings", ["id-%08d" % i for i in range(size)]
+    yield "objects", [{"id": i, "tags": ["a", i % 7]} for i in range(size)]
+
+
+def measure(func, arg):
+    best = None
+    for _ in range(3):
+        start = time.time()
+        func(arg)
+        duration = time.time() - start
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def main(sizes=(1000, 10000, 100000)):
+    schema = {"type": "array", "uniqueItems": True}
+    validators = (
+        ("jsonschema", jsonschema.Draft4Validator(schema).is_valid),
+        ("draft4", compiler.Draft4Validator(schema).is_valid),
+        ("compiled", jsb.Array(is_set=True).compile().is_valid),
+    )
+    print("%-8s %-16s %12s %12s %12s" % (
+        ("size", "items") + tuple(name for name, _ in validators)
+    ))
+    for size in sizes:
+        for kind, items in arrays(size):
+            for label, data in (
+                (kind, items),
+                (kind + "+dup", items + items[:1]),
+            ):
+                timings = [
+                    "%9.2f ms" % (measure(func, data) * 1e3)
+                    for _, func in validators
+                ]
+                print("%-8d %-16s %12s %12s %12s" % (
+                    (size, label) + tuple(timings)
+                ))
+
+
+if __name__ == "__main__":
+    main(*[[int(a) for a in sys.argv[1:]]] if sys.argv[1:] else [])
@@ -7,7 +7,12 @@ try:
         extras = {
             "install_requires": [
                 l.strip() for l in r.readlines() if l.strip()
-            ]
+            ],
+            "entry_points": {
+                "console_scripts": [
+                    "schemabuilder = schemabuilder.cli:main",
+                ],
+            },
         }
 except ImportError:
     from distutils.core import setup
@@ -0,0 +1,199 @@
+"""Validate newline delimited JSON records against a schema definition.
+
+Usage::
+
+    schemabuilder myapp.schemas:my_schemas user records.ndjson
+    cat records.ndjson | schemabuilder schemas.json user -p 4
+
+"""
+import argparse
+import collections
+import importlib
+import io
+import itertools
+import json
+import os
+import sys
+import time
+
+import jsonschema
+
+from . import compiler
+from . import formats
+from . import parallel
+
+
+def main(argv=None, stdin=None, stdout=None, stderr=None):
+    """Run the command line validator.
+
+    :return: exit status; 1 if any record is invalid.
+
+    """
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    args = _parser().parse_args(argv)
+
+    try:
+        schema = load_schema(args.schema)
+    except (IOError, ImportError, AttributeError, ValueError) as e:
+        stderr.write("Failed to load %r: %s\n" % (args.schema, e,))
+        return 2
+    if args.definition not in schema.get("definitions", {}):
+        stderr.write("Unknown definition: %r\n" % args.definition)
+        return 2
+
+    positions = collections.deque()
+    lines = _read_lines(
+        args.files or ["-"], args.buffer_size, positions, stdin
+    )
+    if args.processes > 1:
+        results = parallel.validate_many(
+            schema, args.definition, lines, args.processes,
+            chunk_size=args.chunk_size, loads=json.loads,
+            max_errors=args.max_errors,
+        )
+    else:
+        results = _validate_lines(
+            schema, args.definition, lines, args.max_errors
+        )
+
+    start = time.time()
+    count = failures = size = 0
+    for errors in results:
+        path, lineno, line_size = positions.popleft()
+        count += 1
+        size += line_size
+        if not errors:
+            continue
+        failures += 1
+        for error in errors:
+            _write(stdout, u"%s:%d: %s: %s\n" % (
+                path, lineno, _pointer(error.path), error.message,
+            ))
+
+    duration = max(time.time() - start, 1e-6)
+    stderr.write(
+        "%d records, %d invalid, in %.3fs (%.0f records/s, %.1f MB/s)\n" % (
+            count, failures, duration, count / duration,
+            size / duration / 1e6,
+        )
+    )
+    return 1 if failures else 0
+
+
+def load_schema(path):
+    """Load a serialized schema.
+
+    :param path: either a path to a JSON file or a "module:attribute"
+                 path to a :class:`schemabuilder.Schema` (or a dict).
+
+    """
+    if os.path.isfile(path) or ":" not in path:
+        with open(path) as f:
+            return json.load(f)
+
+    module_name, _, attr = path.partition(":")
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    schema = importlib.import_module(module_name)
+    for name in attr.split("."):
+        schema = getattr(schema, name)
+    if hasattr(schema, "to_dict"):
+        schema = schema.to_dict()
+    return schema
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog="schemabuilder",
+        description=(
+            "Validate newline delimited JSON records against a schema "
+            "definition."
+        ),
+    )
+    parser.add_argument(
+        "schema",
+        help='JSON schema file, or "module:attribute" path to a Schema'
+    )
+    parser.add_argument("definition", help="id of the definition")
+    parser.add_argument(
+        "files", nargs="*", metavar="file",
+        help="NDJSON file; '-' or none to read from the standard input"
+    )
+    parser.add_argument(
+        "-p", "--processes", type=int, default=1,
+        help="number of worker processes (default: 1)"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=1000,
+        help="records sent to a worker at once (default: 1000)"
+    )
+    parser.add_argument(
+        "--max-errors", type=_max_errors, default=None, metavar="N",
+        help="stop validating a record after N errors (default: report "
+             "all errors)"
+    )
+    parser.add_argument(
+        "--buffer-size", type=int, default=1 << 20,
+        help="read buffer size, in bytes (default: 1MiB)"
+    )
+    return parser
+
+
+def _max_errors(value):
+    value = int(value)
+    if value < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return value
+
+
+def _read_lines(paths, buffer_size, positions, stdin=None):
+    """Yield non empty lines, recording their position in `positions`.
+
+    """
+    for path in paths:
+        if path == "-":
+            f = stdin or io.open(
+                sys.stdin.fileno(), "rb", buffering=buffer_size,
+                closefd=False
+            )
+        else:
+            f = io.open(path, "rb", buffering=buffer_size)
+        try:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                positions.append((path, lineno, len(line),))
+                yield line
+        finally:
+            if f is not stdin:
+                f.close()
+
+
+def _validate_lines(schema, id, lines, max_errors=None):
+    validator = compiler.Draft4Validator(
+        {'$ref': '#/definitions/%s' % id},
+        resolver=jsonschema.RefResolver.from_schema(schema),
+        format_checker=formats.checker,
+    )
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield [jsonschema.ValidationError("Invalid record: %s" % e)]
+            continue
+        yield list(
+            itertools.islice(validator.iter_errors(record), max_errors)
+        )
+
+
+def _write(stream, text):
+    stream.write(text.encode("utf-8"))
+
+
+def _pointer(path):
+    return "/" + "/".join("%s" % (p,) for p in path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
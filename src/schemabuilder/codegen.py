@@ -0,0 +1,625 @@
+"""Generate a standalone python module validating schema definitions.
+
+The module has one validation function per definition, named after the
+definition id (`validate_<id>`), and a `validate(id, data)` function.
+References to definitions become direct function calls; regex patterns
+and enums are compiled when the module is imported. The module only
+depends on the standard library.
+
+Validation functions raise the module `ValidationError` on the first
+error found. The `format` keyword is checked for the built-in formats of
+:mod:`schemabuilder.formats`; other formats can't be generated.
+
+Usage::
+
+    from schemabuilder import codegen
+
+    codegen.write(my_schemas, "myapp/validators.py")
+
+"""
+import itertools
+import re
+
+from . import formats
+from . import utils
+
+
+_PREAMBLE = '''"""Validators generated by schemabuilder; do not edit.
+
+"""
+import calendar
+import re
+import socket
+
+try:
+    _str = basestring
+    _int = (int, long,)
+except NameError:
+    _str = str
+    _int = (int,)
+_num = _int + (float,)
+
+
+class ValidationError(ValueError):
+    """Raised when the data is invalid.
+
+    :ivar message: the error message.
+    :ivar path: path to the invalid value, as a list.
+    :ivar validator: the failing schema keyword.
+
+    """
+
+    def __init__(self, message, path=(), validator=None):
+        ValueError.__init__(self, message)
+        self.message = message
+        self.path = list(path)
+        self.validator = validator
+
+
+def _json_key(value):
+    if isinstance(value, bool):
+        return (bool, value)
+    if isinstance(value, dict):
+        return (
+            dict,
+            frozenset((k, _json_key(v)) for k, v in value.items()),
+        )
+    if isinstance(value, (list, tuple,)):
+        return (list, tuple(_json_key(v) for v in value))
+    return value
+
+
+def _is_valid(validator, data, path):
+    try:
+        validator(data, path)
+    except ValidationError:
+        return False
+    return True
+
+
+def _any_of(data, path, validators):
+    for validator in validators:
+        if _is_valid(validator, data, path):
+            return
+    raise ValidationError(
+        "%r is not valid under any of the given schemas" % (data,),
+        path,
+        "anyOf",
+    )
+
+
+def _one_of(data, path, validators):
+    valid = [v for v in validators if _is_valid(v, data, path)]
+    if len(valid) == 1:
+        return
+    if valid:
+        message = "%r is valid under more than one of the given schemas"
+    else:
+        message = "%r is not valid under any of the given schemas"
+    raise ValidationError(message % (data,), path, "oneOf")
+'''
+
+_TYPE_CHECKS = {
+    "array": "isinstance(%s, list)",
+    "boolean": "isinstance(%s, bool)",
+    "integer": "(isinstance(%s, _int) and not isinstance(%s, bool))",
+    "null": "%s is None",
+    "number": "(isinstance(%s, _num) and not isinstance(%s, bool))",
+    "object": "isinstance(%s, dict)",
+    "string": "isinstance(%s, _str)",
+}
+
+_STRING_KEYWORDS = ("minLength", "maxLength", "pattern", "format",)
+_NUMBER_KEYWORDS = ("minimum", "maximum", "multipleOf",)
+_OBJECT_KEYWORDS = (
+    "properties",
+    "patternProperties",
+    "additionalProperties",
+    "required",
+    "dependencies",
+    "minProperties",
+    "maxProperties",
+)
+_ARRAY_KEYWORDS = (
+    "items", "additionalItems", "minItems", "maxItems", "uniqueItems",
+)
+
+# keywords checked by the generated code, or not affecting validation.
+_KEYWORDS = frozenset(
+    _STRING_KEYWORDS + _NUMBER_KEYWORDS + _OBJECT_KEYWORDS +
+    _ARRAY_KEYWORDS + (
+        "$ref", "type", "enum", "allOf", "anyOf", "oneOf",
+        "exclusiveMinimum", "exclusiveMaximum",
+        "id", "$schema", "title", "description", "default", "definitions",
+    )
+)
+
+# built-in formats the generated module can check, with the checker
+# registered for them in `formats`; a format registered again with a
+# custom checker can't be generated.
+_FORMAT_CHECKERS = {
+    "email": formats.is_email,
+    "hostname": formats.is_hostname,
+    "uri": formats.is_uri,
+    "ipv4": formats.is_ipv4,
+    "ipv6": getattr(formats, "is_ipv6", None),
+    "date-time": formats.is_date_time,
+    "regex": formats.is_regex,
+}
+
+# formats checked with one of the `formats` patterns.
+_FORMAT_PATTERNS = {
+    "email": formats._email.__self__.pattern,
+    "hostname": formats._hostname.__self__.pattern,
+    "uri": formats._uri.__self__.pattern,
+    "ipv4": formats._ipv4.__self__.pattern,
+}
+
+# other formats, checked by a generated function of a string.
+_FORMAT_FUNCTIONS = {
+    "ipv6": '''def %(name)s(instance):
+    try:
+        socket.inet_pton(socket.AF_INET6, instance)
+    except (socket.error, ValueError, UnicodeError):
+        return False
+    return True''',
+    "date-time": '''def %(name)s(instance):
+    match = %(match)s(instance)
+    if match is None:
+        return False
+    year, month, day, hour, minute, second, tz_hour, tz_minute = map(
+        int, match.groups("0")
+    )
+    return (
+        1 <= month <= 12 and
+        1 <= day <= calendar.mdays[month] + (
+            month == 2 and calendar.isleap(year)
+        ) and
+        hour <= 23 and minute <= 59 and second <= 60 and
+        tz_hour <= 23 and tz_minute <= 59
+    )''',
+    "regex": '''def %(name)s(instance):
+    try:
+        re.compile(instance)
+    except re.error:
+        return False
+    return True''',
+}
+
+
+def generate(schema):
+    """Return the source of the validation module of a schema.
+
+    :param schema: a :class:`schemabuilder.Schema` or a serialized
+                   schema.
+    :raise ValueError: for references outside the schema definitions,
+                       or keywords the module can't check (e.g. `not`,
+                       or a custom `format`).
+
+    """
+    if hasattr(schema, "to_dict"):
+        schema = schema.to_dict()
+    return _Module(schema.get("definitions", {})).source()
+
+
+def write(schema, path):
+    """Write the validation module of a schema to `path`.
+
+    """
+    with open(path, "w") as f:
+        f.write(generate(schema))
+
+
+def _escape(text):
+    """Escape text inserted in a :meth:`_Writer.fail` message."""
+    return text.replace("%", "%%")
+
+
+class _Writer(object):
+
+    def __init__(self, lines, level=1):
+        self.lines = lines
+        self.level = level
+
+    def line(self, text):
+        self.lines.append("    " * self.level + text)
+
+    def indented(self):
+        return _Writer(self.lines, self.level + 1)
+
+    def fail(self, message, var, path, keyword):
+        """Raise a ValidationError; `message` is formatted with the value
+        of `var`. Text taken from the schema should be escaped with
+        :func:`_escape`.
+
+        """
+        self.line("raise ValidationError(%r %% (%s,), %s, %r)" % (
+            message, var, path, keyword,
+        ))
+
+
+class _Module(object):
+
+    def __init__(self, definitions):
+        self.definitions = definitions
+        self.constants = []
+        self.functions = []
+        self.names = {}
+        self.pointers = {}
+        self.formats = {}
+        self.used_names = set()
+        self.counter = itertools.count()
+
+    def source(self):
+        for id in sorted(self.definitions):
+            self.definition(id)
+        lines = [_PREAMBLE, ""]
+        lines.extend(self.constants)
+        for function in self.functions:
+            lines.extend(["", ""])
+            lines.extend(function)
+        lines.extend(["", "", "VALIDATORS = {"])
+        for id in sorted(self.definitions):
+            lines.append("    %r: %s," % (id, self.names[id],))
+        lines.extend([
+            "}",
+            "",
+            "",
+            "def validate(id, data):",
+            '    """Validate data against the `id` definition."""',
+            "    VALIDATORS[id](data)",
+            "",
+        ])
+        return "\n".join(lines)
+
+    def name(self, prefix):
+        base = name = re.sub(r"\W", "_", prefix)
+        while name in self.used_names:
+            name = "%s_%d" % (base, next(self.counter))
+        self.used_names.add(name)
+        return name
+
+    def var(self):
+        return "v%d" % next(self.counter)
+
+    def constant(self, expression, prefix="_C"):
+        name = self.name("%s%d" % (prefix, next(self.counter)))
+        self.constants.append("%s = %s" % (name, expression))
+        return name
+
+    def format(self, format):
+        """Return the condition template testing a string doesn't match
+        a format, generating the check the first time.
+
+        """
+        if format in self.formats:
+            return self.formats[format]
+        func, _ = formats.checker.checkers.get(format, (None, None,))
+        if func is None or func is not _FORMAT_CHECKERS.get(format):
+            raise ValueError("Unsupported format: %r" % (format,))
+
+        if format in _FORMAT_PATTERNS:
+            match = self.constant(
+                "re.compile(%r).match" % (_FORMAT_PATTERNS[format],),
+                "_FORMAT"
+            )
+            condition = "%s(%%s) is None" % match
+        else:
+            name = self.name("_is_%s" % format)
+            match = None
+            if format == "date-time":
+                match = self.constant(
+                    "re.compile(%r).match" % (
+                        formats._date_time.__self__.pattern,
+                    ),
+                    "_FORMAT"
+                )
+            self.functions.append((_FORMAT_FUNCTIONS[format] % {
+                "name": name, "match": match,
+            }).splitlines())
+            condition = "not %s(%%s)" % name
+        self.formats[format] = condition
+        return condition
+
+    def definition(self, id):
+        """Return the name of the function validating a definition,
+        generating it the first time.
+
+        """
+        if id in self.names:
+            return self.names[id]
+        if id not in self.definitions:
+            raise ValueError("Unresolvable reference: %r" % id)
+        name = self.names[id] = self.name("validate_%s" % id)
+        self.function(name, self.definitions[id])
+        return name
+
+    def ref(self, ref):
+        if not ref.startswith(utils.DEF_PREFIX):
+            raise ValueError("Unsupported reference: %r" % ref)
+        path = utils.definition_path(ref)
+        if len(path) == 1:
+            return self.definition(path[0])
+        if ref in self.pointers:
+            return self.pointers[ref]
+
+        node = self.definitions
+        try:
+            for segment in path:
+                if isinstance(node, list):
+                    segment = int(segment)
+                node = node[segment]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise ValueError("Unresolvable reference: %r" % ref)
+        if not isinstance(node, dict):
+            raise ValueError("Unresolvable reference: %r" % ref)
+        name = self.pointers[ref] = self.name("_s%d" % next(self.counter))
+        self.function(name, node)
+        return name
+
+    def subschema(self, schema):
+        """Generate a function for a subschema, for combinators."""
+        name = self.name("_s%d" % next(self.counter))
+        self.function(name, schema)
+        return name
+
+    def function(self, name, schema):
+        lines = ["def %s(data, path=()):" % name]
+        self.functions.append(lines)
+        writer = _Writer(lines)
+        self.node(writer, schema, "data", "path")
+        if len(lines) == 1:
+            writer.line("pass")
+
+    def node(self, w, schema, var, path):
+        unknown = set(schema).difference(_KEYWORDS)
+        if unknown:
+            raise ValueError(
+                "Unsupported keywords: %s" % ", ".join(sorted(unknown))
+            )
+        if "$ref" in schema:
+            w.line("%s(%s, %s)" % (self.ref(schema["$ref"]), var, path,))
+            return
+
+        if "type" in schema:
+            self.type_(w, schema["type"], var, path)
+        if "enum" in schema:
+            enum = self.constant(
+                "frozenset(_json_key(v) for v in %r)" % (schema["enum"],),
+                "_ENUM"
+            )
+            w.line("if _json_key(%s) not in %s:" % (var, enum,))
+            w.indented().fail(
+                "%%r is not one of %s" % _escape(repr(schema["enum"])),
+                var, path, "enum"
+            )
+        for subschema in schema.get("allOf", ()):
+            self.node(w, subschema, var, path)
+        for keyword, helper in (("anyOf", "_any_of"), ("oneOf", "_one_of")):
+            if keyword in schema:
+                names = [self.subschema(s) for s in schema[keyword]]
+                w.line("%s(%s, %s, (%s,))" % (
+                    helper, var, path, ", ".join(names),
+                ))
+
+        # Keywords only apply to some types; skip the type guard when the
+        # node type is already checked.
+        single = schema.get("type")
+        if single == "integer":
+            single = "number"
+        groups = (
+            ("string", _STRING_KEYWORDS, self.string),
+            ("number", _NUMBER_KEYWORDS, self.number),
+            ("object", _OBJECT_KEYWORDS, self.object),
+            ("array", _ARRAY_KEYWORDS, self.array),
+        )
+        for type_name, keywords, method in groups:
+            if not any(k in schema for k in keywords):
+                continue
+            if single == type_name:
+                method(w, schema, var, path)
+                continue
+            check = _TYPE_CHECKS[type_name]
+            w.line("if %s:" % (check % ((var,) * check.count("%s"))))
+            method(w.indented(), schema, var, path)
+
+    def type_(self, w, types, var, path):
+        names = [types] if isinstance(types, basestring) else types
+        try:
+            checks = [_TYPE_CHECKS[t] % ((var,) * _TYPE_CHECKS[t].count("%s"))
+                      for t in names]
+        except KeyError as e:
+            raise ValueError("Unknown type %r" % e.args[0])
+        w.line("if not (%s):" % " or ".join(checks))
+        w.indented().fail(
+            "%%r is not of type %s" % _escape(
+                ", ".join(repr(t) for t in names)
+            ),
+            var, path, "type"
+        )
+
+    def string(self, w, schema, var, path):
+        if "minLength" in schema:
+            w.line("if len(%s) < %r:" % (var, schema["minLength"]))
+            w.indented().fail("%r is too short", var, path, "minLength")
+        if "maxLength" in schema:
+            w.line("if len(%s) > %r:" % (var, schema["maxLength"]))
+            w.indented().fail("%r is too long", var, path, "maxLength")
+        if "pattern" in schema:
+            regex = self.constant(
+                "re.compile(%r).search" % (schema["pattern"],), "_PATTERN"
+            )
+            w.line("if %s(%s) is None:" % (regex, var))
+            w.indented().fail(
+                "%%r does not match %s" % _escape(repr(schema["pattern"])),
+                var, path, "pattern"
+            )
+        if "format" in schema:
+            w.line("if %s:" % (self.format(schema["format"]) % var))
+            w.indented().fail(
+                "%%r is not a %s" % _escape(repr(schema["format"])),
+                var, path, "format"
+            )
+
+    def number(self, w, schema, var, path):
+        if "minimum" in schema:
+            if schema.get("exclusiveMinimum"):
+                op, message = "<=", "less than or equal to"
+            else:
+                op, message = "<", "less than"
+            w.line("if %s %s %r:" % (var, op, schema["minimum"]))
+            w.indented().fail(
+                "%%r is %s the minimum of %r" % (message, schema["minimum"]),
+                var, path, "minimum"
+            )
+        if "maximum" in schema:
+            if schema.get("exclusiveMaximum"):
+                op, message = ">=", "greater than or equal to"
+            else:
+                op, message = ">", "greater than"
+            w.line("if %s %s %r:" % (var, op, schema["maximum"]))
+            w.indented().fail(
+                "%%r is %s the maximum of %r" % (
+                    message, schema["maximum"],
+                ),
+                var, path, "maximum"
+            )
+        if "multipleOf" in schema:
+            value = schema["multipleOf"]
+            if isinstance(value, float):
+                w.line("if int(%s / %r) != %s / %r:" % (
+                    var, value, var, value,
+                ))
+            else:
+                w.line("if %s %% %r:" % (var, value))
+            w.indented().fail(
+                "%%r is not a multiple of %r" % (value,),
+                var, path, "multipleOf"
+            )
+
+    def object(self, w, schema, var, path):
+        for name in schema.get("required", ()):
+            w.line("if %r not in %s:" % (name, var))
+            w.indented().line(
+                "raise ValidationError(%r, %s, 'required')" % (
+                    "%r is a required property" % (name,), path,
+                )
+            )
+        if "minProperties" in schema:
+            w.line("if len(%s) < %r:" % (var, schema["minProperties"]))
+            w.indented().fail(
+                "%r does not have enough properties", var, path,
+                "minProperties"
+            )
+        if "maxProperties" in schema:
+            w.line("if len(%s) > %r:" % (var, schema["maxProperties"]))
+            w.indented().fail(
+                "%r has too many properties", var, path, "maxProperties"
+            )
+
+        for name, deps in sorted(schema.get("dependencies", {}).items()):
+            w.line("if %r in %s:" % (name, var))
+            body = w.indented()
+            if isinstance(deps, dict):
+                self.node(body, deps, var, path)
+                continue
+            for dep in deps:
+                body.line("if %r not in %s:" % (dep, var))
+                body.indented().line(
+                    "raise ValidationError(%r, %s, 'dependencies')" % (
+                        "%r is a dependency of %r" % (dep, name), path,
+                    )
+                )
+
+        properties = schema.get("properties", {})
+        for name, subschema in sorted(properties.items()):
+            w.line("if %r in %s:" % (name, var))
+            body = w.indented()
+            child = self.var()
+            body.line("%s = %s[%r]" % (child, var, name))
+            self.node(body, subschema, child, "%s + (%r,)" % (path, name))
+
+        patterns = schema.get("patternProperties", {})
+        additional = schema.get("additionalProperties", True)
+        if not patterns and additional is True:
+            return
+
+        key, child = self.var(), self.var()
+        w.line("for %s, %s in %s.items():" % (key, child, var))
+        body = w.indented()
+        child_path = "%s + (%s,)" % (path, key)
+        searches = []
+        for pattern, subschema in sorted(patterns.items()):
+            search = self.constant(
+                "re.compile(%r).search" % (pattern,), "_PATTERN"
+            )
+            searches.append(search)
+            body.line("if %s(%s) is not None:" % (search, key))
+            self.node(body.indented(), subschema, child, child_path)
+        if additional is True:
+            return
+
+        conditions = ["%s not in %s" % (key, self.constant(
+            "frozenset(%r)" % (sorted(properties),), "_PROPERTIES"
+        ))]
+        conditions.extend("%s(%s) is None" % (s, key) for s in searches)
+        body.line("if %s:" % " and ".join(conditions))
+        if additional is False:
+            body.indented().fail(
+                "Additional properties are not allowed (%r was unexpected)",
+                key, path, "additionalProperties"
+            )
+        else:
+            self.node(body.indented(), additional, child, child_path)
+
+    def array(self, w, schema, var, path):
+        if "minItems" in schema:
+            w.line("if len(%s) < %r:" % (var, schema["minItems"]))
+            w.indented().fail("%r is too short", var, path, "minItems")
+        if "maxItems" in schema:
+            w.line("if len(%s) > %r:" % (var, schema["maxItems"]))
+            w.indented().fail("%r is too long", var, path, "maxItems")
+        if schema.get("uniqueItems"):
+            w.line(
+                "if len(set(_json_key(i) for i in %s)) != len(%s):" % (
+                    var, var,
+                )
+            )
+            w.indented().fail(
+                "%r has non-unique elements", var, path, "uniqueItems"
+            )
+
+        items = schema.get("items")
+        if isinstance(items, dict):
+            index, child = self.var(), self.var()
+            w.line("for %s, %s in enumerate(%s):" % (index, child, var))
+            self.node(
+                w.indented(), items, child, "%s + (%s,)" % (path, index)
+            )
+            return
+        if not items:
+            return
+
+        for index, subschema in enumerate(items):
+            w.line("if len(%s) > %d:" % (var, index))
+            body = w.indented()
+            child = self.var()
+            body.line("%s = %s[%d]" % (child, var, index))
+            self.node(body, subschema, child, "%s + (%d,)" % (path, index))
+
+        additional = schema.get("additionalItems", True)
+        if additional is False:
+            w.line("if len(%s) > %d:" % (var, len(items)))
+            w.indented().fail(
+                "Additional items are not allowed in %r", var, path,
+                "additionalItems"
+            )
+        elif additional is not True:
+            index, child = self.var(), self.var()
+            w.line("for %s, %s in enumerate(%s[%d:], %d):" % (
+                index, child, var, len(items), len(items),
+            ))
+            self.node(
+                w.indented(), additional, child,
+                "%s + (%s,)" % (path, index)
+            )
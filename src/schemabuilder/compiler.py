@@ -0,0 +1,971 @@
+"""Compile schema primitives into validation closures.
+
+Each schema node is turned into a single check function. A check takes
+an instance and returns an iterable of
+:class:`jsonschema.ValidationError`. Keyword values (lengths, bounds,
+required property names, regex...) are bound once, when the node is
+compiled, instead of being dispatched on every validation.
+
+"""
+import itertools
+import threading
+
+import jsonschema
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import formats
+from . import utils
+
+
+_TYPES = {
+    "array": (list,),
+    "boolean": (bool,),
+    "integer": (int, long,),
+    "null": (type(None),),
+    "number": (int, long, float,),
+    "object": (dict,),
+    "string": (basestring,),
+}
+
+ARRAY = _TYPES["array"]
+NUMBER = _TYPES["number"]
+OBJECT = _TYPES["object"]
+STRING = _TYPES["string"]
+
+
+class Validator(object):
+    """Validate instances against a compiled schema.
+
+    Exposes the same validation methods than
+    :class:`jsonschema.Draft4Validator`. It doesn't hold any state
+    while validating and can be shared between threads.
+
+    :param check: compiled check of the schema.
+
+    """
+
+    def __init__(self, check):
+        self._check = check
+
+    def iter_errors(self, instance):
+        """Lazily yield the errors of an instance."""
+        return iter(self._check(instance))
+
+    def is_valid(self, instance):
+        """Return True if the instance is valid."""
+        for _ in self._check(instance):
+            return False
+        return True
+
+    def validate(self, instance):
+        """Raise the first error of the instance, if any."""
+        for error in self._check(instance):
+            raise error
+
+
+def compile_node(node):
+    """Compile a schema node.
+
+    `node` is either a primitive or a schema dict; a dict is validated
+    by :mod:`jsonschema` and cannot reference schema definitions.
+
+    """
+    if isinstance(node, dict):
+        return from_dict(node)
+    return node._compile()
+
+
+def _pattern_keyword(validator, value, instance, schema):
+    if not validator.is_type(instance, "string"):
+        return
+    if utils.compile_pattern(value).search(instance) is None:
+        yield jsonschema.ValidationError(
+            "%r does not match %r" % (instance, value,)
+        )
+
+
+def _pattern_properties_keyword(validator, value, instance, schema):
+    if not validator.is_type(instance, "object"):
+        return
+    for pattern, subschema in value.iteritems():
+        search = utils.compile_pattern(pattern).search
+        for name, prop in instance.iteritems():
+            if search(name) is None:
+                continue
+            for error in validator.descend(
+                prop, subschema, path=name, schema_path=pattern
+            ):
+                yield error
+
+
+def _additional_properties_keyword(validator, value, instance, schema):
+    if not validator.is_type(instance, "object"):
+        return
+    names = schema.get("properties", {})
+    patterns = schema.get("patternProperties", {})
+    searches = [utils.compile_pattern(p).search for p in patterns]
+    extras = [
+        name for name in instance
+        if name not in names and not any(s(name) for s in searches)
+    ]
+
+    if validator.is_type(value, "object"):
+        for name in extras:
+            for error in validator.descend(instance[name], value, path=name):
+                yield error
+    elif not value and extras:
+        if patterns:
+            yield jsonschema.ValidationError(
+                "%s %s not match any of the regexes: %s" % (
+                    ", ".join(repr(n) for n in sorted(extras)),
+                    "does" if len(extras) == 1 else "do",
+                    ", ".join(repr(p) for p in sorted(patterns)),
+                )
+            )
+        else:
+            yield jsonschema.ValidationError(
+                "Additional properties are not allowed (%s %s "
+                "unexpected)" % (
+                    ", ".join(repr(n) for n in extras),
+                    "was" if len(extras) == 1 else "were",
+                )
+            )
+
+
+_ENUM_CACHE_SIZE = 1024
+_enum_cache = {}
+_enum_cache_lock = threading.Lock()
+_enum_ticks = itertools.count()
+
+
+def _enum_index(values):
+    """Return the keys of an enum list, indexed once per list.
+
+    Like :func:`schemabuilder.utils.compile_pattern`, the least recently
+    used quarter of the cache is dropped when it's full. The cache holds
+    on to the list, so its id can't be reused while cached.
+
+    """
+    entry = _enum_cache.get(id(values))
+    if entry is not None:
+        entry[2] = next(_enum_ticks)
+        return entry[1]
+
+    keys = enum_keys(values)
+    with _enum_cache_lock:
+        if len(_enum_cache) >= _ENUM_CACHE_SIZE:
+            entries = sorted(_enum_cache.items(), key=lambda i: i[1][2])
+            for key, _ in entries[:max(1, len(entries) // 4)]:
+                del _enum_cache[key]
+        _enum_cache[id(values)] = [values, keys, next(_enum_ticks)]
+    return keys
+
+
+def _enum_keyword(validator, value, instance, schema):
+    if json_key(instance) not in _enum_index(value):
+        yield jsonschema.ValidationError(
+            "%r is not one of %r" % (instance, value,)
+        )
+
+
+def _unique_items_keyword(validator, value, instance, schema):
+    if (
+        value and
+        validator.is_type(instance, "array") and
+        has_duplicates(instance)
+    ):
+        yield jsonschema.ValidationError(
+            "%r has non-unique elements" % (instance,)
+        )
+
+
+#: :class:`jsonschema.Draft4Validator` looking patterns up in the
+#: shared cache of :func:`schemabuilder.utils.compile_pattern`, instead
+#: of the much smaller `re` module cache, and checking enums and unique
+#: items with hashed sets (with JSON equality: `True` is not `1`).
+Draft4Validator = jsonschema.validators.extend(
+    jsonschema.Draft4Validator,
+    {
+        u"enum": _enum_keyword,
+        u"uniqueItems": _unique_items_keyword,
+        u"pattern": _pattern_keyword,
+        u"patternProperties": _pattern_properties_keyword,
+        u"additionalProperties": _additional_properties_keyword,
+    },
+)
+
+
+def from_dict(schema, resolver=None):
+    """Wrap a jsonschema validator of a schema dict into a check.
+
+    Validators are built on demand and pooled, since a validator (and
+    its resolver scope) can only be used by one validation at a time.
+    Like the schema validator pools, the pool is a plain list.
+
+    :param resolver: optional callable returning the
+                     :class:`jsonschema.RefResolver` to use.
+
+    """
+    cls = jsonschema.validators.validator_for(schema)
+    if cls is jsonschema.Draft4Validator:
+        cls = Draft4Validator
+    cls.check_schema(schema)
+    pool = []
+
+    def check(instance):
+        try:
+            validator = pool.pop()
+        except IndexError:
+            validator = cls(
+                schema,
+                resolver=resolver() if resolver else None,
+                format_checker=formats.checker,
+            )
+        return _checked_in(pool, validator, validator.iter_errors(instance))
+    return check
+
+
+def _checked_in(pool, validator, errors):
+    """Yield the errors, then append the validator back to its pool."""
+    try:
+        for error in errors:
+            yield error
+    finally:
+        pool.append(validator)
+
+
+def _valid(instance):
+    return ()
+
+
+def _error(keyword, value, instance, message, **kw):
+    return jsonschema.ValidationError(
+        message,
+        validator=keyword,
+        validator_value=value,
+        instance=instance,
+        schema_path=(keyword,),
+        **kw
+    )
+
+
+def _descend(errors, path, *schema_path):
+    for error in errors:
+        if path is not None:
+            error.path.appendleft(path)
+        error.schema_path.extendleft(reversed(schema_path))
+        yield error
+
+
+# types whose instances are their own JSON key.
+_PLAIN = frozenset([int, long, float, str, unicode, type(None)])
+
+
+def json_key(value):
+    """Return a hashable key of a JSON value.
+
+    Two values have the same key if they are equal as JSON values: `1`
+    and `1.0` share a key, `1` and `True` don't. Objects and arrays are
+    converted recursively.
+
+    """
+    # exact types first: it's the hot path of enum and uniqueItems.
+    cls = value.__class__
+    if cls in _PLAIN:
+        return value
+    if cls is dict:
+        return (dict, frozenset([
+            (k, v if v.__class__ in _PLAIN else json_key(v))
+            for k, v in value.iteritems()
+        ]))
+    if cls is list:
+        return (list, tuple([
+            v if v.__class__ in _PLAIN else json_key(v) for v in value
+        ]))
+
+    if isinstance(value, bool):
+        return (bool, value)
+    if isinstance(value, dict):
+        return (
+            dict,
+            frozenset((k, json_key(v)) for k, v in value.iteritems()),
+        )
+    if isinstance(value, (list, tuple,)):
+        return (list, tuple(json_key(v) for v in value))
+    return value
+
+
+def has_duplicates(items):
+    """Return True if two items are equal JSON values.
+
+    Runs in linear time: items are hashed, and only canonicalized with
+    :func:`json_key` when they're not all hashable and different.
+
+    """
+    try:
+        # values different in python are different JSON values too, and
+        # the reverse holds without booleans, objects or arrays.
+        if len(set(items)) == len(items):
+            return False
+        if set(map(type, items)) <= _PLAIN:
+            return True
+    except TypeError:
+        pass
+
+    seen = set()
+    add = seen.add
+    for item in items:
+        key = item if item.__class__ in _PLAIN else json_key(item)
+        if key in seen:
+            return True
+        add(key)
+    return False
+
+
+def enum_keys(values):
+    """Index enum values by their JSON key.
+
+    :return: frozenset of the values keys (see :func:`json_key`).
+
+    """
+    return frozenset(json_key(v) for v in values)
+
+
+def node(checks):
+    """Combine keyword checks into one node check."""
+    checks = tuple(c for c in checks if c is not _valid)
+    if not checks:
+        return _valid
+    if len(checks) == 1:
+        return checks[0]
+
+    def check(instance):
+        for keyword_check in checks:
+            for error in keyword_check(instance):
+                yield error
+    return check
+
+
+def typed(types, checks):
+    """Only run the checks for instances of the given python types.
+
+    Booleans are not considered as numbers.
+
+    """
+    keywords_check = node(checks)
+    if keywords_check is _valid:
+        return _valid
+
+    def check(instance):
+        if isinstance(instance, types) and instance.__class__ is not bool:
+            return keywords_check(instance)
+        return ()
+    return check
+
+
+def type_(types):
+    names = [types] if isinstance(types, basestring) else list(types)
+    try:
+        py_types = tuple(t for name in names for t in _TYPES[name])
+    except KeyError as e:
+        raise jsonschema.SchemaError("Unknown type %r" % e.args[0])
+    bool_allowed = "boolean" in names
+    message = "%%r is not of type %s" % ", ".join(repr(n) for n in names)
+
+    def check(instance):
+        if instance.__class__ is bool:
+            if bool_allowed:
+                return ()
+        elif isinstance(instance, py_types):
+            return ()
+        return (_error("type", types, instance, message % (instance,)),)
+    return check
+
+
+def enum(values):
+    keys = enum_keys(values)
+
+    def check(instance):
+        if json_key(instance) in keys:
+            return ()
+        return (
+            _error(
+                "enum", values, instance,
+                "%r is not one of %r" % (instance, values,)
+            ),
+        )
+    return check
+
+
+def format_(name):
+    """Check a format registered in :mod:`schemabuilder.formats`;
+    unknown formats are not checked.
+
+    """
+    conforms = formats.check(name)
+    if conforms is None:
+        return _valid
+    message = "%%r is not a %r" % (name,)
+
+    def check(instance):
+        if conforms(instance):
+            return ()
+        return (_error("format", name, instance, message % (instance,)),)
+    return check
+
+
+def all_of(checks):
+    checks = tuple(checks)
+
+    def check(instance):
+        for index, subcheck in enumerate(checks):
+            for error in _descend(subcheck(instance), None, "allOf", index):
+                yield error
+    return check
+
+
+def any_of(checks, value):
+    checks = tuple(checks)
+
+    def check(instance):
+        context = []
+        for index, subcheck in enumerate(checks):
+            errors = list(_descend(subcheck(instance), None, index))
+            if not errors:
+                return ()
+            context.extend(errors)
+        return (
+            _error(
+                "anyOf", value, instance,
+                "%r is not valid under any of the given schemas" % (
+                    instance,
+                ),
+                context=context,
+            ),
+        )
+    return check
+
+
+def one_of(checks, value):
+    checks = tuple(checks)
+
+    def check(instance):
+        context = []
+        valid = []
+        for index, subcheck in enumerate(checks):
+            errors = list(_descend(subcheck(instance), None, index))
+            if errors:
+                context.extend(errors)
+                continue
+            valid.append(index)
+            if len(valid) > 1:
+                return (
+                    _error(
+                        "oneOf", value, instance,
+                        "%r is valid under each of %s" % (
+                            instance, ", ".join(str(i) for i in valid),
+                        ),
+                    ),
+                )
+        if valid:
+            return ()
+        return (
+            _error(
+                "oneOf", value, instance,
+                "%r is not valid under any of the given schemas" % (
+                    instance,
+                ),
+                context=context,
+            ),
+        )
+    return check
+
+
+def min_length(limit):
+    def check(instance):
+        if len(instance) < limit:
+            return (
+                _error(
+                    "minLength", limit, instance, "%r is too short" % (
+                        instance,
+                    )
+                ),
+            )
+        return ()
+    return check
+
+
+def max_length(limit):
+    def check(instance):
+        if len(instance) > limit:
+            return (
+                _error(
+                    "maxLength", limit, instance, "%r is too long" % (
+                        instance,
+                    )
+                ),
+            )
+        return ()
+    return check
+
+
+def pattern(value):
+    search = utils.compile_pattern(value).search
+
+    def check(instance):
+        if search(instance) is None:
+            return (
+                _error(
+                    "pattern", value, instance, "%r does not match %r" % (
+                        instance, value,
+                    )
+                ),
+            )
+        return ()
+    return check
+
+
+def minimum(limit, exclusive=False):
+    if exclusive:
+        message = "%r is less than or equal to the minimum of %r"
+    else:
+        message = "%r is less than the minimum of %r"
+
+    def check(instance):
+        if instance < limit or (exclusive and instance == limit):
+            return (
+                _error("minimum", limit, instance, message % (
+                    instance, limit,
+                )),
+            )
+        return ()
+    return check
+
+
+def maximum(limit, exclusive=False):
+    if exclusive:
+        message = "%r is greater than or equal to the maximum of %r"
+    else:
+        message = "%r is greater than the maximum of %r"
+
+    def check(instance):
+        if instance > limit or (exclusive and instance == limit):
+            return (
+                _error("maximum", limit, instance, message % (
+                    instance, limit,
+                )),
+            )
+        return ()
+    return check
+
+
+def multiple_of(value):
+    is_float = isinstance(value, float)
+
+    def check(instance):
+        if is_float:
+            quotient = instance / value
+            failed = int(quotient) != quotient
+        else:
+            failed = instance % value
+        if failed:
+            return (
+                _error(
+                    "multipleOf", value, instance,
+                    "%r is not a multiple of %r" % (instance, value,)
+                ),
+            )
+        return ()
+    return check
+
+
+def properties(checks):
+    checks = tuple(checks.iteritems())
+
+    def check(instance):
+        for name, subcheck in checks:
+            if name in instance:
+                errors = subcheck(instance[name])
+                for error in _descend(errors, name, "properties", name):
+                    yield error
+    return check
+
+
+def pattern_properties(checks):
+    checks = tuple(
+        (value, utils.compile_pattern(value).search, subcheck,)
+        for value, subcheck in checks.iteritems()
+    )
+
+    def check(instance):
+        for value, search, subcheck in checks:
+            for name, prop in instance.iteritems():
+                if search(name) is None:
+                    continue
+                errors = subcheck(prop)
+                for error in _descend(
+                    errors, name, "patternProperties", value
+                ):
+                    yield error
+    return check
+
+
+def additional_properties(value, names, patterns):
+    """Check properties not listed in `names` or matching `patterns`.
+
+    :param value: either False or the compiled check of additional
+                  properties.
+
+    """
+    names = frozenset(names)
+    searches = tuple(utils.compile_pattern(p).search for p in patterns)
+
+    def extras(instance):
+        for name in instance:
+            if name in names:
+                continue
+            if any(search(name) for search in searches):
+                continue
+            yield name
+
+    def check(instance):
+        if value is False:
+            unexpected = list(extras(instance))
+            if unexpected:
+                verb = "was" if len(unexpected) == 1 else "were"
+                yield _error(
+                    "additionalProperties", False, instance,
+                    "Additional properties are not allowed (%s %s "
+                    "unexpected)" % (
+                        ", ".join(repr(n) for n in sorted(unexpected)),
+                        verb,
+                    )
+                )
+            return
+        for name in extras(instance):
+            for error in _descend(
+                value(instance[name]), name, "additionalProperties"
+            ):
+                yield error
+    return check
+
+
+def required(names):
+    names = tuple(names)
+    required_set = frozenset(names)
+
+    def check(instance):
+        if instance.viewkeys() >= required_set:
+            return ()
+        return [
+            _error(
+                "required", list(names), instance,
+                "%r is a required property" % (name,)
+            )
+            for name in names if name not in instance
+        ]
+    return check
+
+
+def dependencies(deps):
+    """Check properties dependencies.
+
+    :param deps: dict of property name to either a list of property
+                 names or a compiled check.
+
+    """
+    deps = tuple(deps.iteritems())
+
+    def check(instance):
+        for name, dep in deps:
+            if name not in instance:
+                continue
+            if callable(dep):
+                for error in _descend(
+                    dep(instance), None, "dependencies", name
+                ):
+                    yield error
+                continue
+            for each in dep:
+                if each not in instance:
+                    yield _error(
+                        "dependencies", dep, instance,
+                        "%r is a dependency of %r" % (each, name,)
+                    )
+    return check
+
+
+def min_properties(limit):
+    def check(instance):
+        if len(instance) < limit:
+            return (
+                _error(
+                    "minProperties", limit, instance,
+                    "%r does not have enough properties" % (instance,)
+                ),
+            )
+        return ()
+    return check
+
+
+def max_properties(limit):
+    def check(instance):
+        if len(instance) > limit:
+            return (
+                _error(
+                    "maxProperties", limit, instance,
+                    "%r has too many properties" % (instance,)
+                ),
+            )
+        return ()
+    return check
+
+
+def items(item_check):
+    def check(instance):
+        for index, item in enumerate(instance):
+            for error in _descend(item_check(item), index, "items"):
+                yield error
+    return check
+
+
+#: minimum size of the arrays :func:`numeric_items` (and of the columns
+#: :func:`numeric_column`) checks in bulk.
+VECTOR_MIN_SIZE = 256
+
+_FLOAT_TYPES = frozenset([int, float])
+_INT_TYPES = frozenset([int])
+
+# ints from that magnitude on may be rounded when converted to floats.
+_FLOAT_EXACT = 2 ** 53
+
+
+def numeric_items(item_check, **kw):
+    """Check the items of an array of numbers in bulk, with numpy.
+
+    Arrays of at least :data:`VECTOR_MIN_SIZE` items, all of them python
+    ints (or floats, unless `integer` is set), are converted once to a
+    numpy array and their range and `multipleOf` constraints checked in
+    bulk. Only the failing items are checked again with `item_check`, to
+    report their errors. Other arrays are checked one item at a time.
+
+    Requires numpy.
+
+    :param item_check: compiled check of an item.
+    :param kw: constraints of the items; see :func:`numeric_column`.
+
+    """
+    column = numeric_column(item_check, **kw)
+
+    def check(instance):
+        for index, error in column(instance):
+            error.path.appendleft(index)
+            error.schema_path.appendleft("items")
+            yield error
+    return check
+
+
+def numeric_column(
+    item_check,
+    integer=False,
+    minimum=None,
+    exclusive_minimum=False,
+    maximum=None,
+    exclusive_maximum=False,
+    multiple_of=None,
+):
+    """Return a batch check of a list of numbers, checked with numpy.
+
+    See :func:`numeric_items`; the batch check yields the index of each
+    failing value with its errors.
+
+    """
+    fallback = batch(item_check)
+    valid_types = _INT_TYPES if integer else _FLOAT_TYPES
+    dtype = numpy.int64 if integer else numpy.float64
+    if multiple_of is not None and isinstance(multiple_of, float):
+        dtype = numpy.float64
+
+    def failures(values):
+        failed = numpy.zeros(len(values), dtype=bool)
+        if minimum is not None:
+            failed |= (
+                values <= minimum if exclusive_minimum else values < minimum
+            )
+        if maximum is not None:
+            failed |= (
+                values >= maximum if exclusive_maximum else values > maximum
+            )
+        if multiple_of is not None:
+            if dtype is numpy.float64:
+                quotient = values / multiple_of
+                failed |= numpy.trunc(quotient) != quotient
+            else:
+                failed |= values % multiple_of != 0
+        return numpy.flatnonzero(failed)
+
+    def check(values):
+        if len(values) < VECTOR_MIN_SIZE:
+            return fallback(values)
+        # bools, longs, None, strings... are left to the item check.
+        types = set(map(type, values))
+        if not types <= valid_types:
+            return fallback(values)
+        array = numpy.array(values, dtype=dtype)
+        # so are arrays of ints not exactly represented as floats.
+        if (
+            dtype is numpy.float64 and int in types and
+            numpy.abs(array).max() >= _FLOAT_EXACT
+        ):
+            return fallback(values)
+        indices = failures(array)
+        if not len(indices):
+            return ()
+        return (
+            (index, error)
+            for index in indices.tolist()
+            for error in item_check(values[index])
+        )
+    return check
+
+
+def tuple_items(checks):
+    checks = tuple(checks)
+
+    def check(instance):
+        for index, (item, item_check) in enumerate(zip(instance, checks)):
+            for error in _descend(item_check(item), index, "items", index):
+                yield error
+    return check
+
+
+def additional_items(limit):
+    """Forbid items after the first `limit` ones."""
+    def check(instance):
+        if len(instance) <= limit:
+            return ()
+        extras = instance[limit:]
+        verb = "was" if len(extras) == 1 else "were"
+        return (
+            _error(
+                "additionalItems", False, instance,
+                "Additional items are not allowed (%s %s unexpected)" % (
+                    ", ".join(repr(i) for i in extras), verb,
+                )
+            ),
+        )
+    return check
+
+
+def min_items(limit):
+    def check(instance):
+        if len(instance) < limit:
+            return (
+                _error(
+                    "minItems", limit, instance, "%r is too short" % (
+                        instance,
+                    )
+                ),
+            )
+        return ()
+    return check
+
+
+def max_items(limit):
+    def check(instance):
+        if len(instance) > limit:
+            return (
+                _error(
+                    "maxItems", limit, instance, "%r is too long" % (
+                        instance,
+                    )
+                ),
+            )
+        return ()
+    return check
+
+
+def unique_items():
+    def check(instance):
+        if has_duplicates(instance):
+            return (
+                _error(
+                    "uniqueItems", True, instance,
+                    "%r has non-unique elements" % (instance,)
+                ),
+            )
+        return ()
+    return check
+
+
+def compile_batch(node):
+    """Compile a schema node into a batch check.
+
+    A batch check takes a list of instances and yields, for each error,
+    the index of the failing instance and the error.
+
+    """
+    if isinstance(node, dict):
+        return batch(from_dict(node))
+    return node._compile_batch()
+
+
+def batch(check):
+    """Turn a check into a batch check, checking one value at a time."""
+    def batch_check(values):
+        for index, value in enumerate(values):
+            for error in check(value):
+                yield index, error
+    return batch_check
+
+
+def columns(node_check, record_check, column_checks):
+    """Return a batch check of records, validated property by property.
+
+    The values of each property are collected in a column and checked
+    at once by the property batch check; their errors are mapped back
+    to the records. The other constraints of the records are checked
+    one record at a time, by `record_check`.
+
+    Records which are not dicts are checked by `node_check`.
+
+    :param node_check: compiled check of the object node.
+    :param record_check: compiled check of the object node, excluding
+                         the `properties` keyword.
+    :param column_checks: dict of property name to its batch check.
+
+    """
+    column_checks = tuple(column_checks.iteritems())
+
+    def check(records):
+        indices = []
+        objects = []
+        for index, record in enumerate(records):
+            if record.__class__ is dict:
+                indices.append(index)
+                objects.append(record)
+            else:
+                for error in node_check(record):
+                    yield index, error
+
+        for name, column_check in column_checks:
+            rows = [row for row, obj in enumerate(objects) if name in obj]
+            if not rows:
+                continue
+            column = [objects[row][name] for row in rows]
+            for row, error in column_check(column):
+                error.path.appendleft(name)
+                error.schema_path.extendleft(("properties", name)[::-1])
+                yield indices[rows[row]], error
+
+        if record_check is _valid:
+            return
+        for index, record in zip(indices, objects):
+            for error in record_check(record):
+                yield index, error
+    return check
+
@@ -0,0 +1,159 @@
+"""Check the `format` of string values.
+
+:data:`checker` is the registry used by schema validators and compiled
+validators. It knows `email`, `uri`, `date-time`, `ipv4`, `ipv6`,
+`hostname` and `regex`, without any optional dependency; each checker is
+a precompiled regex match with, at most, a few range checks.
+
+Custom formats can be added with :func:`register`::
+
+    from schemabuilder import formats
+
+    @formats.register("even")
+    def is_even(instance):
+        return not isinstance(instance, int) or instance % 2 == 0
+
+Compiled validators bind their format checker when compiled; register
+formats before compiling the schema using them.
+
+"""
+import calendar
+import re
+import socket
+
+import jsonschema
+
+
+#: format checker holding the registered formats.
+checker = jsonschema.FormatChecker(formats=())
+
+
+def register(format, raises=()):
+    """Return a decorator registering a format checker.
+
+    The checker takes an instance and returns True if it's valid; it
+    should accept any instance of a type the format doesn't apply to.
+
+    :param format: name of the format.
+    :param raises: exceptions the checker raises for invalid instances.
+
+    """
+    return checker.checks(format, raises)
+
+
+def check(format):
+    """Return the checker function of a format, or None if unknown.
+
+    The function takes an instance and returns True if it's valid.
+
+    """
+    try:
+        func, raises = checker.checkers[format]
+    except KeyError:
+        return None
+    if not raises:
+        return func
+
+    def conforms(instance):
+        try:
+            return func(instance)
+        except raises:
+            return False
+    return conforms
+
+
+_HOSTNAME = (
+    r"(?=.{1,253}\.?$)"
+    r"[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+    r"(?:\.[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?)*\.?"
+)
+_hostname = re.compile(r"\A%s\Z" % _HOSTNAME).match
+
+_ATOM = r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+"
+_email = re.compile(
+    r"\A" + _ATOM + r"(?:\." + _ATOM + r")*@(?=[^@]{1,255}\Z)" +
+    _HOSTNAME + r"\Z"
+).match
+
+_URI_CHAR = r"(?:[A-Za-z0-9\-._~!$&'()*+,;=:@/?\[\]]|%[0-9A-Fa-f]{2})"
+_uri = re.compile(
+    r"\A[A-Za-z][A-Za-z0-9+.\-]*:%s*(?:#%s*)?\Z" % (_URI_CHAR, _URI_CHAR,)
+).match
+
+_OCTET = r"(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])"
+_ipv4 = re.compile(r"\A%s(?:\.%s){3}\Z" % (_OCTET, _OCTET,)).match
+
+_date_time = re.compile(
+    r"\A(\d{4})-(\d{2})-(\d{2})[Tt ](\d{2}):(\d{2}):(\d{2})(?:\.\d+)?"
+    r"(?:[Zz]|[+-](\d{2}):(\d{2}))\Z"
+).match
+
+
+@register("email")
+def is_email(instance):
+    if not isinstance(instance, basestring):
+        return True
+    return _email(instance) is not None
+
+
+@register("hostname")
+def is_hostname(instance):
+    if not isinstance(instance, basestring):
+        return True
+    return _hostname(instance) is not None
+
+
+@register("uri")
+def is_uri(instance):
+    if not isinstance(instance, basestring):
+        return True
+    return _uri(instance) is not None
+
+
+@register("ipv4")
+def is_ipv4(instance):
+    if not isinstance(instance, basestring):
+        return True
+    return _ipv4(instance) is not None
+
+
+if hasattr(socket, "inet_pton"):
+    @register("ipv6")
+    def is_ipv6(instance):
+        if not isinstance(instance, basestring):
+            return True
+        try:
+            socket.inet_pton(socket.AF_INET6, instance)
+        except (socket.error, ValueError, UnicodeError):
+            return False
+        return True
+
+
+@register("date-time")
+def is_date_time(instance):
+    """Check a RFC 3339 date-time."""
+    if not isinstance(instance, basestring):
+        return True
+    match = _date_time(instance)
+    if match is None:
+        return False
+    year, month, day, hour, minute, second, tz_hour, tz_minute = map(
+        int, match.groups("0")
+    )
+    return (
+        1 <= month <= 12 and
+        1 <= day <= calendar.mdays[month] + (
+            month == 2 and calendar.isleap(year)
+        ) and
+        hour <= 23 and minute <= 59 and second <= 60 and
+        tz_hour <= 23 and tz_minute <= 59
+    )
+
+
+# validated strings are not cached with the schema patterns: they could
+# fill the pattern cache.
+@register("regex", raises=re.error)
+def is_regex(instance):
+    if not isinstance(instance, basestring):
+        return True
+    return re.compile(instance)
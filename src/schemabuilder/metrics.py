@@ -0,0 +1,98 @@
+"""Cheap, always-on validation counters.
+
+Counters are sharded per thread: a thread only ever increments its own
+shard, without locking. Shards are summed when a snapshot is taken.
+
+"""
+import bisect
+import collections
+import threading
+
+
+#: upper bounds of the latency histogram buckets, in seconds; the last
+#: bucket counts the validations slower than the last bound.
+BUCKETS = (0.0001, 0.001, 0.01, 0.1, 1.0,)
+
+_VALIDATIONS, _FAILURES, _HITS, _MISSES, _LATENCY = range(5)
+_SIZE = _LATENCY + len(BUCKETS) + 1
+
+
+DefinitionStats = collections.namedtuple(
+    "DefinitionStats",
+    ["validations", "failures", "cache_hits", "cache_misses", "latency"]
+)
+
+
+class Metrics(object):
+    """Count validations, failures, latencies and validator cache use
+    per definition.
+
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+
+    def __reduce__(self):
+        return (self.__class__, ())
+
+    def validation(self, id, duration, failed):
+        """Record a validation.
+
+        :param duration: validation time in seconds, or None if unknown.
+
+        """
+        counters = self._counters(id)
+        counters[_VALIDATIONS] += 1
+        if failed:
+            counters[_FAILURES] += 1
+        if duration is not None:
+            counters[_LATENCY + bisect.bisect_left(BUCKETS, duration)] += 1
+
+    def cache(self, id, hit):
+        """Record a validator cache hit or miss."""
+        self._counters(id)[_HITS if hit else _MISSES] += 1
+
+    def snapshot(self, ids=()):
+        """Return the statistics per definition.
+
+        :param ids: ids to include even if they were never validated.
+        :return: dict of id to
+                 :class:`schemabuilder.metrics.DefinitionStats`; the
+                 latency is a tuple of (upper bound, count) pairs.
+
+        """
+        totals = dict((id, [0] * _SIZE) for id in ids)
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for id, counters in shard.items():
+                total = totals.setdefault(id, [0] * _SIZE)
+                for index, count in enumerate(list(counters)):
+                    total[index] += count
+
+        bounds = BUCKETS + (float("inf"),)
+        return dict(
+            (id, DefinitionStats(
+                total[_VALIDATIONS],
+                total[_FAILURES],
+                total[_HITS],
+                total[_MISSES],
+                tuple(zip(bounds, total[_LATENCY:])),
+            ))
+            for id, total in totals.iteritems()
+        )
+
+    def _counters(self, id):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+
+        counters = shard.get(id)
+        if counters is None:
+            counters = shard[id] = [0] * _SIZE
+        return counters
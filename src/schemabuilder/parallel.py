@@ -0,0 +1,151 @@
+"""Validate batches of records with a pool of worker processes.
+
+The serialized schema is sent once to each worker, when it starts.
+Records are then sent by chunks; errors are sent back as plain tuples
+and rebuilt as :class:`jsonschema.ValidationError` in the parent
+process.
+
+"""
+import collections
+import itertools
+import multiprocessing
+
+import jsonschema
+
+from . import compiler
+from . import formats
+from . import utils
+
+
+_validator = None
+_loads = None
+_max_errors = None
+
+
+def validate_many(
+    schema, id, records, processes, chunk_size=1000, loads=None,
+    max_errors=None
+):
+    """Validate records against a definition of a serialized schema.
+
+    Results are yielded in the records order, like
+    :meth:`schemabuilder.Schema.validate_many`. At most two chunks per
+    worker are in flight, so records are consumed lazily.
+
+    :param schema: the serialized schema, as returned by
+                   :meth:`schemabuilder.Schema.to_dict`.
+    :param id: id of the schema in the list of definition.
+    :param records: iterable of data to validate.
+    :param processes: number of worker processes.
+    :param chunk_size: number of records sent to a worker at once.
+    :param loads: optional function the workers use to decode the
+                  records (e.g. :func:`json.loads`). A record failing
+                  to decode gets a single error, with its `validator`
+                  attribute set to None. The errors instance is not set
+                  when records are decoded by the workers.
+    :param max_errors: maximum number of errors reported per record;
+                       all of them by default.
+    :raise ValueError: if `max_errors` is lower than 1.
+
+    """
+    utils.check_max_errors(max_errors)
+    return _validate_many(
+        schema, id, records, processes, chunk_size, loads, max_errors
+    )
+
+
+def _validate_many(schema, id, records, processes, chunk_size, loads,
+                   max_errors):
+    pool = multiprocessing.Pool(
+        processes,
+        initializer=_init_worker,
+        initargs=(schema, id, loads, max_errors,)
+    )
+    pending = collections.deque()
+    try:
+        for chunk in _chunks(records, chunk_size):
+            pending.append(
+                (chunk, pool.apply_async(_validate_chunk, (chunk,)),)
+            )
+            if len(pending) < 2 * processes:
+                continue
+            for errors in _collect(loads, *pending.popleft()):
+                yield errors
+
+        while pending:
+            for errors in _collect(loads, *pending.popleft()):
+                yield errors
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+def _chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _collect(loads, chunk, result):
+    with_instance = loads is None
+    for record, errors in itertools.izip(chunk, result.get()):
+        yield [_load_error(record, e, with_instance) for e in errors]
+
+
+def _init_worker(schema, id, loads, max_errors=None):
+    global _validator, _loads, _max_errors
+    _validator = compiler.Draft4Validator(
+        {'$ref': '#/definitions/%s' % id},
+        resolver=jsonschema.RefResolver.from_schema(schema),
+        format_checker=formats.checker,
+    )
+    _loads = loads
+    _max_errors = max_errors
+
+
+def _validate_chunk(chunk):
+    return [_validate_record(record) for record in chunk]
+
+
+def _validate_record(record):
+    if _loads is not None:
+        try:
+            record = _loads(record)
+        except ValueError as e:
+            return [("Invalid record: %s" % e, None, None, [], [])]
+    errors = itertools.islice(_validator.iter_errors(record), _max_errors)
+    return [_dump_error(e) for e in errors]
+
+
+def _dump_error(error):
+    return (
+        error.message,
+        error.validator,
+        error.validator_value,
+        list(error.path),
+        list(error.schema_path),
+    )
+
+
+def _load_error(record, dumped, with_instance):
+    message, validator, value, path, schema_path = dumped
+    error = jsonschema.ValidationError(
+        message,
+        validator=validator,
+        validator_value=value,
+        path=path,
+        schema_path=schema_path,
+    )
+    if with_instance:
+        instance = record
+        for key in path:
+            instance = instance[key]
+        error.instance = instance
+    return error
@@ -4,9 +4,13 @@
 """
 import copy
 
+from . import compiler
 from . import utils
 
 
+_SLOTS = frozenset(["_dict_cache", "_parents", "_values"])
+
+
 class Generic(utils.ToDictMixin):
     """Base schema class
 
@@ -28,11 +32,62 @@ class Generic(utils.ToDictMixin):
     :param all_of: list of schema. The value must validate against all
                    of them.
 
+    Only the properties set (not None) are stored, in a dict; unset
+    properties listed in `_fields` read as None.
+
     """
+    __slots__ = ("_values",)
+
+    #: properties reading as None when unset; see
+    #: :class:`schemabuilder.utils.ToDictMixin`.
+    _fields = (
+        "id",
+        "description",
+        "title",
+        "default",
+        "enum",
+        "type",
+        "format",
+        "one_of",
+        "all_of",
+        "any_of",
+        "_required",
+        "_dependencies",
+    )
+
+    def __new__(cls, *args, **kw):
+        self = super(Generic, cls).__new__(cls, *args, **kw)
+        object.__setattr__(self, "_values", {})
+        return self
 
     def __init__(self, **kw):
         self._update(**kw)
 
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        if name in self._field_set:
+            return None
+        raise AttributeError(
+            "%r object has no attribute %r" % (type(self).__name__, name)
+        )
+
+    def _properties(self):
+        return self._values
+
+    def _set_property(self, name, value):
+        if name in _SLOTS:
+            object.__setattr__(self, name, value)
+        elif value is None:
+            self._values.pop(name, None)
+        else:
+            self._values[name] = value
+
+    def _load_properties(self, properties):
+        object.__setattr__(self, "_values", properties)
+
     def _update(
         self,
         id=None,
@@ -74,6 +129,55 @@ class Generic(utils.ToDictMixin):
         generic._update(**kw)
         return generic
 
+    def compile(self):
+        """Compile the schema into a validator.
+
+        The schema is compiled into one check per node, with its
+        constraints bound at compile time; the validator doesn't use the
+        serialized schema.
+
+        :rtype: :class:`schemabuilder.compiler.Validator`
+
+        """
+        return compiler.Validator(self._compile())
+
+    def _compile(self):
+        return compiler.node(self._checks())
+
+    def _compile_batch(self):
+        """Compile the node into a batch check; see
+        :func:`schemabuilder.compiler.compile_batch`.
+
+        """
+        return compiler.batch(self._compile())
+
+    def _checks(self):
+        """Return the list of checks of the node constraints.
+
+        """
+        checks = []
+        if self.type:
+            checks.append(compiler.type_(self.type))
+        if self.enum is not None:
+            checks.append(compiler.enum(self.enum))
+        if self.format:
+            checks.append(compiler.format_(self.format))
+        if self.all_of:
+            checks.append(compiler.all_of(
+                compiler.compile_node(s) for s in self.all_of
+            ))
+        if self.any_of:
+            checks.append(compiler.any_of(
+                (compiler.compile_node(s) for s in self.any_of),
+                self.any_of,
+            ))
+        if self.one_of:
+            checks.append(compiler.one_of(
+                (compiler.compile_node(s) for s in self.one_of),
+                self.one_of,
+            ))
+        return checks
+
 
 class Str(Generic):
     """a String type with its optional min/max length and pattern
@@ -81,9 +185,18 @@ class Str(Generic):
 
     :param min: minimum length of the string.
     :param max: maximum length of the string.
-    :param pattern: regex pattern the string should validate against.
+    :param pattern: regex pattern the string should validate against;
+                    it's compiled when set.
+    :raise ValueError: if the pattern is not a valid regex.
 
     """
+    __slots__ = ()
+    _fields = ("pattern", "min_length", "max_length",)
+
+    def _set_property(self, name, value):
+        if name == "pattern" and value is not None:
+            utils.compile_pattern(value)
+        super(Str, self)._set_property(name, value)
 
     def _update(self, min=None, max=None, pattern=None, **kw):
         kw.setdefault("type", "string")
@@ -94,6 +207,18 @@ class Str(Generic):
         if max is not None:
             self.max_length = int(max)
 
+    def _checks(self):
+        checks = []
+        if getattr(self, "min_length", None) is not None:
+            checks.append(compiler.min_length(self.min_length))
+        if getattr(self, "max_length", None) is not None:
+            checks.append(compiler.max_length(self.max_length))
+        if self.pattern is not None:
+            checks.append(compiler.pattern(self.pattern))
+        return super(Str, self)._checks() + [
+            compiler.typed(compiler.STRING, checks)
+        ]
+
 
 class Number(Generic):
     """A number type with its multipleOf and range attributes.
@@ -105,6 +230,14 @@ class Number(Generic):
     :param multiple_of: a value the number should be a multiple of.
 
     """
+    __slots__ = ()
+    _fields = (
+        "multiple_of",
+        "minimum",
+        "maximum",
+        "exclusive_minimum",
+        "exclusive_maximum",
+    )
     _base_type = float
 
     def _update(
@@ -129,11 +262,67 @@ class Number(Generic):
         if exclusive_max is not None:
             self.exclusive_maximum = bool(exclusive_max)
 
+    def _checks(self):
+        checks = []
+        if getattr(self, "minimum", None) is not None:
+            checks.append(compiler.minimum(
+                self.minimum, getattr(self, "exclusive_minimum", False)
+            ))
+        if getattr(self, "maximum", None) is not None:
+            checks.append(compiler.maximum(
+                self.maximum, getattr(self, "exclusive_maximum", False)
+            ))
+        if getattr(self, "multiple_of", None) is not None:
+            checks.append(compiler.multiple_of(self.multiple_of))
+        return super(Number, self)._checks() + [
+            compiler.typed(compiler.NUMBER, checks)
+        ]
+
+    def _vectorizable(self):
+        """Tell if an array of this number can be checked with numpy.
+
+        Only plain numbers, constrained by their type, range and
+        multipleOf, can be.
+
+        """
+        return (
+            compiler.numpy is not None and
+            self.__class__ in (Number, Int,) and
+            self.type in ("number", "integer",) and
+            not (
+                self.enum or self.format or
+                self.one_of or self.all_of or self.any_of
+            )
+        )
+
+    def _compile_batch(self):
+        if self._vectorizable():
+            return compiler.numeric_column(
+                self._compile(), **self._numeric_constraints()
+            )
+        return super(Number, self)._compile_batch()
+
+    def _numeric_items(self):
+        return compiler.numeric_items(
+            self._compile(), **self._numeric_constraints()
+        )
+
+    def _numeric_constraints(self):
+        return dict(
+            integer=self.type == "integer",
+            minimum=getattr(self, "minimum", None),
+            exclusive_minimum=getattr(self, "exclusive_minimum", False),
+            maximum=getattr(self, "maximum", None),
+            exclusive_maximum=getattr(self, "exclusive_maximum", False),
+            multiple_of=getattr(self, "multiple_of", None),
+        )
+
 
 class Int(Number):
     """An integer type with the same attributes than Number.
 
     """
+    __slots__ = ()
     _base_type = int
 
     def _update(self, **kw):
@@ -145,6 +334,8 @@ class Bool(Generic):
     """Boolean type
 
     """
+    __slots__ = ()
+
     def _update(self, **kw):
         kw.setdefault("type", "boolean")
         super(Bool, self)._update(**kw)
@@ -155,7 +346,9 @@ class Object(Generic):
 
     :param properties: dict of properties, key -> property type.
     :param pattern_properties: like properties, but the keys are defines
-                               by a regex pattern.
+                               by a regex pattern; patterns are compiled
+                               when set and raise a ValueError if
+                               invalid.
 
     :param additional_properties: should there be any additional
                                   properties?
@@ -166,6 +359,14 @@ class Object(Generic):
 
 
     """
+    __slots__ = ()
+    _fields = (
+        "properties",
+        "pattern_properties",
+        "additional_properties",
+        "min_properties",
+        "max_properties",
+    )
 
     def _update(
         self,
@@ -187,8 +388,14 @@ class Object(Generic):
         self.max_properties = max
         self._required = required
 
-    def to_dict(self):
-        d = super(Object, self).to_dict()
+    def _set_property(self, name, value):
+        if name == "pattern_properties" and value:
+            for pattern in value:
+                utils.compile_pattern(pattern)
+        super(Object, self)._set_property(name, value)
+
+    def _to_dict(self):
+        d = super(Object, self)._to_dict()
         required, deps = self._requirements()
         if required:
             d["required"] = required
@@ -210,11 +417,74 @@ class Object(Generic):
 
         return list(required), deps
 
+    def _compile_batch(self):
+        """Check the records property by property; see
+        :func:`schemabuilder.compiler.columns`.
+
+        """
+        if not self.properties:
+            return super(Object, self)._compile_batch()
+        return compiler.columns(
+            self._compile(),
+            compiler.node(self._checks(columnar=True)),
+            {
+                k: compiler.compile_batch(v)
+                for k, v in self.properties.iteritems()
+            },
+        )
+
+    def _checks(self, columnar=False):
+        checks = []
+        if self.properties and not columnar:
+            checks.append(compiler.properties({
+                k: compiler.compile_node(v)
+                for k, v in self.properties.iteritems()
+            }))
+        if self.pattern_properties:
+            checks.append(compiler.pattern_properties({
+                k: compiler.compile_node(v)
+                for k, v in self.pattern_properties.iteritems()
+            }))
+        additional = self.additional_properties
+        if additional is not None and additional is not True:
+            checks.append(compiler.additional_properties(
+                False if additional is False
+                else compiler.compile_node(additional),
+                self.properties or (),
+                self.pattern_properties or (),
+            ))
+        if self.min_properties is not None:
+            checks.append(compiler.min_properties(self.min_properties))
+        if self.max_properties is not None:
+            checks.append(compiler.max_properties(self.max_properties))
+
+        required, deps = self._requirements()
+        if required:
+            checks.append(compiler.required(required))
+        if deps:
+            checks.append(compiler.dependencies({
+                k: v if isinstance(v, (list, tuple,))
+                else compiler.compile_node(v)
+                for k, v in deps.iteritems()
+            }))
+        return super(Object, self)._checks() + [
+            compiler.typed(compiler.OBJECT, checks)
+        ]
+
 
 class Array(Generic):
     """Array type.
 
     """
+    __slots__ = ()
+    _fields = (
+        "items",
+        "additional_items",
+        "min_items",
+        "max_items",
+        "unique_items",
+    )
+
     def _update(
         self,
         items=None,
@@ -234,3 +504,25 @@ class Array(Generic):
             self.additional_items = bool(additional_items)
         if is_set is not None:
             self.unique_items = is_set
+
+    def _checks(self):
+        checks = []
+        if isinstance(self.items, (list, tuple,)):
+            checks.append(compiler.tuple_items(
+                compiler.compile_node(i) for i in self.items
+            ))
+            if getattr(self, "additional_items", True) is False:
+                checks.append(compiler.additional_items(len(self.items)))
+        elif isinstance(self.items, Number) and self.items._vectorizable():
+            checks.append(self.items._numeric_items())
+        elif self.items is not None:
+            checks.append(compiler.items(compiler.compile_node(self.items)))
+        if self.min_items is not None:
+            checks.append(compiler.min_items(self.min_items))
+        if self.max_items is not None:
+            checks.append(compiler.max_items(self.max_items))
+        if getattr(self, "unique_items", False):
+            checks.append(compiler.unique_items())
+        return super(Array, self)._checks() + [
+            compiler.typed(compiler.ARRAY, checks)
+        ]
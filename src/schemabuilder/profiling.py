@@ -0,0 +1,104 @@
+"""Record the time spent validating, per keyword and per definition.
+
+Profiling is opt-in (see :meth:`schemabuilder.Schema.enable_profiling`):
+a profiled schema hands out validators whose keyword functions are
+wrapped with timers; other schemas keep using the plain
+:class:`schemabuilder.compiler.Draft4Validator`, at no cost.
+
+Timings are inclusive: the time of a keyword (or of a definition)
+includes the time spent validating the nested values. Keywords errors
+are yielded lazily, so validation still stops early with `max_errors`;
+the time spent by the caller between two errors is not counted.
+
+"""
+import threading
+import time
+
+import jsonschema
+
+from . import compiler
+from . import utils
+
+
+class Profile(object):
+    """Hold call counts and time spent per keyword and per definition.
+
+    :param callback: optional callable, called after each timed call
+                     with the kind ("keyword" or "definition"), the
+                     keyword or definition id and the duration, in
+                     seconds.
+
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._stats = {"keyword": {}, "definition": {}}
+
+    def record(self, kind, name, duration):
+        with self._lock:
+            stats = self._stats[kind].get(name)
+            if stats is None:
+                stats = self._stats[kind][name] = [0, 0.0]
+            stats[0] += 1
+            stats[1] += duration
+        if self.callback is not None:
+            self.callback(kind, name, duration)
+
+    def as_dict(self):
+        """Return the statistics as a dict.
+
+        E.g.::
+
+            {
+                "keyword": {"pattern": {"calls": 2, "time": 0.0001}},
+                "definition": {"user": {"calls": 1, "time": 0.0003}},
+            }
+
+        """
+        with self._lock:
+            return dict(
+                (kind, dict(
+                    (name, {"calls": calls, "time": duration})
+                    for name, (calls, duration) in stats.iteritems()
+                ))
+                for kind, stats in self._stats.iteritems()
+            )
+
+    def reset(self):
+        with self._lock:
+            self._stats = {"keyword": {}, "definition": {}}
+
+    def validator_class(self, cls=compiler.Draft4Validator):
+        """Return a copy of the `cls` validator class recording its
+        keywords calls.
+
+        """
+        return jsonschema.validators.extend(cls, dict(
+            (keyword, self._timed(keyword, func))
+            for keyword, func in cls.VALIDATORS.iteritems()
+        ))
+
+    def _timed(self, keyword, func):
+        record = self.record
+        is_ref = keyword == u"$ref"
+
+        def validate(validator, value, instance, schema):
+            duration = 0.0
+            start = time.time()
+            try:
+                for error in func(validator, value, instance, schema) or ():
+                    duration += time.time() - start
+                    start = None
+                    yield error
+                    start = time.time()
+            finally:
+                if start is not None:
+                    duration += time.time() - start
+                record("keyword", keyword, duration)
+                if is_ref and value.startswith(utils.DEF_PREFIX):
+                    record(
+                        "definition", utils.definition_path(value)[0],
+                        duration
+                    )
+        return validate
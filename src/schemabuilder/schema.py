@@ -2,29 +2,146 @@
 definitions.
 
 """
+import collections
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import threading
+import time
 import weakref
+
 import jsonschema
 
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
+
+from . import compiler
+from . import formats
+from . import metrics
+from . import parallel
 from . import primitives
+from . import profiling
+from . import streaming
 from . import utils
 
 
+ValidatorCacheInfo = collections.namedtuple(
+    "ValidatorCacheInfo", ["hits", "misses", "size"]
+)
+
+SchemaDocument = collections.namedtuple(
+    "SchemaDocument", ["data", "etag", "encoding"]
+)
+
+
+class ValidationErrors(jsonschema.ValidationError):
+    """Raised with the errors collected from an instance.
+
+    The error attributes are the ones of the first error.
+
+    :ivar errors: list of :class:`jsonschema.ValidationError`.
+
+    """
+
+    def __init__(self, errors):
+        first = errors[0]
+        message = first.message
+        if len(errors) > 1:
+            message = "%s (and %d more errors)" % (message, len(errors) - 1)
+        super(ValidationErrors, self).__init__(
+            message,
+            validator=first.validator,
+            path=first.path,
+            cause=first.cause,
+            validator_value=first.validator_value,
+            instance=first.instance,
+            schema=first.schema,
+            schema_path=first.schema_path,
+        )
+        self.errors = errors
+
+
 class Schema(utils.ToDictMixin):
     """Collects schema definitions
 
     """
 
+    _untracked = frozenset([
+        "_validators",
+        "_validator_deps",
+        "_validator_hits",
+        "_validator_misses",
+        "_compiled",
+        "_compiled_batch",
+        "_compiled_referrers",
+        "_linker",
+        "_fragments",
+        "_fragments_source",
+        "_dirty",
+        "_lock",
+        "_json_source",
+        "_json_cache",
+        "_validator_class",
+        "_profile",
+        "_metrics",
+    ])
+
     def __init__(self, id=None, desc=None):
         self._id = id
         self._desc = desc
-        self._schema = None
+        self._fragments = {}
+        self._fragments_source = None
+        self._dirty = set()
+        self._lock = utils.Lock()
+        self._validators = {}
+        self._validator_deps = {}
+        self._validator_hits = 0
+        self._validator_misses = 0
+        self._compiled = {}
+        self._compiled_batch = {}
+        self._compiled_referrers = {}
+        self._linker = None
+        self._validator_class = compiler.Draft4Validator
+        self._profile = None
+        self._metrics = metrics.Metrics()
+        self._json_source = None
+        self._json_cache = {}
         self.definitions = {}
 
     def to_dict(self):
         """Return the schema as a dict ready to be serialized.
 
+        The dict is cached until a definition is added or changed. Only
+        the definitions added or changed since are serialized again; the
+        serialized definitions are updated by one thread at a time.
+
         """
-        schema = super(Schema, self).to_dict()
+        return super(Schema, self).to_dict()
+
+    def _to_dict(self):
+        with self._lock:
+            if self._fragments_source is not self.definitions:
+                self._fragments = {}
+                self._fragments_source = self.definitions
+                self._dirty = set(self.definitions)
+
+            dirty, self._dirty = self._dirty, set()
+            for id in dirty:
+                self._fragments.pop(id, None)
+                if id in self.definitions:
+                    self._fragments.update(
+                        self._serialize({id: self.definitions[id]})
+                    )
+            definitions = dict(self._fragments)
+
+        schema = {"definitions": definitions}
         schema['$schema'] = "http://json-schema.org/draft-04/schema#"
         if self._id:
             schema['id'] = self._id
@@ -32,6 +149,42 @@ class Schema(utils.ToDictMixin):
             schema['description'] = self._desc
         return schema
 
+    def to_json(self, compress=False):
+        """Return the schema encoded as JSON, ready to be published.
+
+        The document is cached until a definition is added or changed,
+        like :meth:`to_dict`. Keys are sorted and non-ASCII characters
+        escaped, so the document and its ETag only depend on the schema
+        content.
+
+        :param compress: return the gzip compressed document instead.
+        :rtype: :class:`schemabuilder.schema.SchemaDocument`
+
+        """
+        schema = self.to_dict()
+        if self._json_source is not schema:
+            self._json_cache = {}
+            self._json_source = schema
+
+        cache = self._json_cache
+        encoding = "gzip" if compress else None
+        if encoding in cache:
+            return cache[encoding]
+
+        if None not in cache:
+            data = json.dumps(
+                schema, sort_keys=True, separators=(",", ":")
+            )
+            cache[None] = SchemaDocument(
+                data, '"%s"' % hashlib.sha1(data).hexdigest(), None
+            )
+        if compress:
+            document = cache[None]
+            cache["gzip"] = SchemaDocument(
+                _gzip(document.data), document.etag[:-1] + '-gzip"', "gzip"
+            )
+        return cache[encoding]
+
     def define(self, id, schema):
         """Add a schema to the list of definition
 
@@ -43,31 +196,360 @@ class Schema(utils.ToDictMixin):
 
         """
         self.definitions[id] = schema
-        self._schema = None
+        with self._lock:
+            self._dirty.add(id)
+        self._adopt(schema)
+        self._touch()
+        self._invalidate(id)
         return self.ref(id)
 
     def ref(self, id):
         return Ref(id, self)
 
     def ref_resolver(self):
-        if self._schema is None:
-            self._schema = self.to_dict()
-        return jsonschema.RefResolver.from_schema(self._schema)
+        return jsonschema.RefResolver.from_schema(self.to_dict())
 
     def validator(self, id):
-        """Create a validator for the current state of the schema.
+        """Return a validator for the current state of the schema.
+
+        Validators are pooled per definition; the pool is dropped when
+        the definition, or a definition it references, is (re)defined.
+        The returned validator is owned by the caller and won't be
+        handed to anyone else.
 
         Note: a validator (the resolver it's using) is not thread safe.
+        :meth:`schemabuilder.schema.Ref.validate` and compiled
+        validators can be shared between threads.
 
         :param id: id of the schema in the list of definition.
         :return: a validator.
         :rtype: :class:`jsonschema.Draft4Validator`
         """
-        return jsonschema.Draft4Validator(
-            {'$ref': '#/definitions/%s' % id},
-            resolver=self.ref_resolver()
+        return self._checkout(id)[1]
+
+    def _checkout(self, id):
+        """Take a validator out of the definition pool.
+
+        Return the pool with the validator; the validator should be
+        appended back to that pool once used. Pools are plain lists:
+        `pop` and `append` are atomic, no lock is needed to share them
+        between threads.
+
+        """
+        pool = self._validators.get(id)
+        if pool is None:
+            deps = _dependencies(self.to_dict()["definitions"], id)
+            pool = self._validators.setdefault(id, [])
+            self._validator_deps[id] = deps
+
+        try:
+            validator = pool.pop()
+        except IndexError:
+            self._validator_misses += 1
+            self._metrics.cache(id, False)
+            validator = self._validator_class(
+                {'$ref': '#/definitions/%s' % id},
+                resolver=self.ref_resolver(),
+                format_checker=formats.checker,
+            )
+        else:
+            self._validator_hits += 1
+            self._metrics.cache(id, True)
+        return pool, validator
+
+    def validate_many(self, id, records, processes=0, chunk_size=1000,
+                      max_errors=None):
+        """Validate records against a definition.
+
+        The validator is borrowed once for the whole batch. Results are
+        yielded lazily, one per record, in order: the list of the record
+        errors, empty if the record is valid.
+
+        With `processes` set, records are validated by chunks in a pool
+        of worker processes, each receiving the serialized schema once
+        (see :func:`schemabuilder.parallel.validate_many`).
+
+        :param id: id of the schema in the list of definition.
+        :param records: iterable of data to validate.
+        :param processes: number of worker processes; validate in the
+                          current process by default.
+        :param chunk_size: number of records sent to a worker at once.
+        :param max_errors: stop validating a record after that many
+                           errors; all errors are collected by default.
+        :return: generator of lists of
+                 :class:`jsonschema.ValidationError`.
+        :raise ValueError: if `max_errors` is lower than 1.
+
+        """
+        utils.check_max_errors(max_errors)
+        if processes:
+            return self._count(id, parallel.validate_many(
+                self.to_dict(), id, records, processes, chunk_size,
+                max_errors=max_errors
+            ))
+        return self._validate_many(id, records, max_errors)
+
+    def validate_many_async(self, id, records, loop=None, executor=None,
+                            **kw):
+        """Validate records in an executor.
+
+        Requires :mod:`asyncio` (or `trollius` on Python 2).
+
+        :param loop: event loop; the current one by default.
+        :param executor: executor to run the validation in; the loop
+                         default executor by default.
+        :param kw: :meth:`validate_many` optional arguments.
+        :return: a future of the list of results of
+                 :meth:`validate_many`.
+
+        """
+        loop = loop or asyncio.get_event_loop()
+        return loop.run_in_executor(
+            executor, lambda: list(self.validate_many(id, records, **kw))
+        )
+
+    def _validate_many(self, id, records, max_errors=None):
+        pool, validator = self._checkout(id)
+        record_validation = self._metrics.validation
+        islice = itertools.islice
+        try:
+            iter_errors = validator.iter_errors
+            for record in records:
+                start = time.time()
+                errors = list(islice(iter_errors(record), max_errors))
+                record_validation(id, time.time() - start, errors)
+                yield errors
+        finally:
+            pool.append(validator)
+
+    def validate_batch(self, id, records):
+        """Validate a list of records, property by property.
+
+        The records of an object definition are validated column-wise:
+        the values of each property are collected and checked together
+        (numbers in bulk, with numpy, when possible) and the errors
+        mapped back to the records. It's usually faster than
+        :meth:`validate_many` for large batches of records of the same
+        shape, but the whole batch is validated before returning and
+        the errors of a record may not be in the same order.
+
+        :param id: id of the schema in the list of definition.
+        :param records: iterable of data to validate.
+        :return: list of lists of :class:`jsonschema.ValidationError`,
+                 one per record, in order; empty if the record is valid.
+
+        """
+        records = list(records)
+        results = [[] for _ in records]
+        for index, error in self._batch_check(id)(records):
+            results[index].append(error)
+        return list(self._count(id, results))
+
+    def _count(self, id, results):
+        """Record validations whose latency is unknown."""
+        record_validation = self._metrics.validation
+        for errors in results:
+            record_validation(id, None, errors)
+            yield errors
+
+    def validate_stream(self, id, stream, chunk_size=65536):
+        """Validate a JSON array as it is read.
+
+        The array is parsed incrementally and each item validated as
+        soon as it is parsed; memory use doesn't depend on the size of
+        the array (except for the keys of the items of a set). See
+        :func:`schemabuilder.streaming.validate_array` for the checked
+        constraints.
+
+        :param id: id of an array definition.
+        :param stream: a file object or an iterable of strings.
+        :param chunk_size: size of the reads from a file object.
+        :return: generator of :class:`jsonschema.ValidationError`.
+        :raise ValueError: (while iterating) if the stream is not a
+                           well formed JSON array.
+
+        """
+        definition = self.definitions[id]
+        while isinstance(definition, Ref):
+            definition = self.definitions[definition._id]
+        if not isinstance(definition, primitives.Array):
+            raise TypeError("%r is not an array definition" % (id,))
+        return streaming.validate_array(
+            definition, streaming.iter_array(stream, chunk_size)
+        )
+
+    def compile(self, id):
+        """Return a compiled validator of a definition.
+
+        The definition is compiled with the definitions it references,
+        each one once; references are linked directly to the compiled
+        definition, except the ones inside a reference cycle, which are
+        looked up when validating.
+
+        Compiled definitions are cached until redefined; redefining a
+        definition drops the compiled definitions referencing it. The
+        validator looks up the compiled definition on each validation
+        and keeps up with its redefinitions.
+
+        :param id: id of the schema in the list of definition.
+        :rtype: :class:`schemabuilder.compiler.Validator`
+        :raise jsonschema.RefResolutionError: if the definition, or a
+                                              definition it references,
+                                              is not defined.
+
+        """
+        self._check(id)
+        return compiler.Validator(self.ref(id)._compile())
+
+    def _check(self, id):
+        check = self._compiled.get(id)
+        if check is not None:
+            return check
+        return self._link(id, self._compiled, self._compile_definition)
+
+    def _batch_check(self, id):
+        check = self._compiled_batch.get(id)
+        if check is not None:
+            return check
+        return self._link(
+            id, self._compiled_batch, self._compile_definition_batch
         )
 
+    def _compile_definition(self, definition):
+        if isinstance(definition, dict):
+            return compiler.from_dict(definition, self.ref_resolver)
+        return definition._compile()
+
+    def _compile_definition_batch(self, definition):
+        if isinstance(definition, dict):
+            return compiler.batch(self._compile_definition(definition))
+        return definition._compile_batch()
+
+    def _link(self, id, cache, compile):
+        """Compile the `id` definition and the ones it references.
+
+        Definitions are compiled dependencies first, one reference
+        cycle at a time (see :func:`_components`), so that references
+        outside cycles find their target compiled and link it directly
+        (see :meth:`_linked`).
+
+        """
+        if id not in self.definitions:
+            raise _unresolvable(id)
+        components, graph, dangling = _components(
+            self.to_dict()["definitions"], id
+        )
+        if dangling:
+            referrer, missing = dangling[0]
+            raise _unresolvable(missing, referrer)
+
+        self._linker = threading.current_thread()
+        try:
+            for component in components:
+                for current in component:
+                    if current in cache:
+                        continue
+                    cache[current] = compile(self.definitions[current])
+                    for ref in graph[current]:
+                        self._compiled_referrers.setdefault(
+                            ref, set()
+                        ).add(current)
+        finally:
+            self._linker = None
+        return cache[id]
+
+    def _linked(self, cache, id):
+        """Return the compiled `id` definition a reference can be linked
+        to, if the definition is being linked by the current thread.
+
+        """
+        if self._linker is threading.current_thread():
+            return cache.get(id)
+        return None
+
+    def validator_cache_info(self):
+        """Return the validator cache statistics.
+
+        :rtype: :class:`schemabuilder.schema.ValidatorCacheInfo`
+
+        """
+        return ValidatorCacheInfo(
+            self._validator_hits,
+            self._validator_misses,
+            len(self._validators),
+        )
+
+    def stats(self):
+        """Return a snapshot of the validation statistics.
+
+        Validations through :meth:`schemabuilder.schema.Ref.validate` and
+        :meth:`validate_many` are counted per definition, along with
+        their latency (except for records validated by worker
+        processes) and the validator cache hits and misses. Counting
+        doesn't take any lock.
+
+        :return: dict of definition id to
+                 :class:`schemabuilder.metrics.DefinitionStats`.
+
+        """
+        return self._metrics.snapshot(self.definitions)
+
+    def enable_profiling(self, callback=None):
+        """Record the time spent validating, per keyword and definition.
+
+        Validators handed out afterward (by :meth:`validator`,
+        :meth:`validate_many` and :meth:`schemabuilder.schema.Ref.validate`)
+        record each keyword call and each reference to a definition.
+        Keywords are timed lazily, so `max_errors` still stops the
+        validation early. Compiled validators are not profiled.
+
+        :param callback: optional callable called after each timed call;
+                         see :class:`schemabuilder.profiling.Profile`.
+        :return: the profile collecting the statistics.
+        :rtype: :class:`schemabuilder.profiling.Profile`
+
+        """
+        self._profile = profiling.Profile(callback)
+        self._validator_class = self._profile.validator_class()
+        self._validators.clear()
+        self._validator_deps.clear()
+        return self._profile
+
+    def disable_profiling(self):
+        """Stop profiling and return the profile, if any.
+
+        """
+        profile, self._profile = self._profile, None
+        self._validator_class = compiler.Draft4Validator
+        self._validators.clear()
+        self._validator_deps.clear()
+        return profile
+
+    def _changed(self, child):
+        super(Schema, self)._changed(child)
+        if child is None:
+            return
+        for id, definition in self.definitions.items():
+            if definition is child:
+                with self._lock:
+                    self._dirty.add(id)
+                self._invalidate(id)
+
+    def _invalidate(self, id):
+        """Drop the cached validators depending on the `id` definition.
+
+        """
+        stale = [id]
+        while stale:
+            current = stale.pop()
+            self._compiled.pop(current, None)
+            self._compiled_batch.pop(current, None)
+            stale.extend(self._compiled_referrers.pop(current, ()))
+        for cached_id, deps in self._validator_deps.items():
+            if id in deps:
+                self._validators.pop(cached_id, None)
+                self._validator_deps.pop(cached_id, None)
+
 
 class Ref(primitives.Generic):
     """Reference to a schema inside a schema collection.
@@ -85,19 +567,200 @@ class Ref(primitives.Generic):
 
     """
 
+    __slots__ = ()
+    _fields = ("_id", "_schema",)
+
     def __init__(self, id, schema, **kw):
         super(Ref, self).__init__(**kw)
         self._id = id
         self._schema = weakref.proxy(schema)
 
-    def validate(self, data):
+    def validate(self, data, max_errors=1):
         """Validate the data against the schema.
 
+        Borrows a validator from the schema collection pool; it's safe to
+        call from many threads at once.
+
+        Validation stops as soon as `max_errors` errors are found. By
+        default, the first error found is raised; otherwise, the errors
+        found are raised together as a
+        :class:`schemabuilder.schema.ValidationErrors`.
+
+        :param max_errors: number of errors to collect before stopping;
+                           None to collect all of them.
+        :raise jsonschema.ValidationError: if the data is invalid.
+        :raise ValueError: if `max_errors` is lower than 1.
+
         """
-        validator = self._schema.validator(self._id)
-        validator.validate(data)
+        utils.check_max_errors(max_errors)
+        schema = self._schema
+        pool, validator = schema._checkout(self._id)
+        start = time.time()
+        failed = True
+        try:
+            if max_errors == 1:
+                validator.validate(data)
+            else:
+                errors = list(
+                    itertools.islice(validator.iter_errors(data), max_errors)
+                )
+                if errors:
+                    raise ValidationErrors(errors)
+            failed = False
+        finally:
+            pool.append(validator)
+            schema._metrics.validation(
+                self._id, time.time() - start, failed
+            )
 
-    def to_dict(self):
-        schema = super(Ref, self).to_dict()
+    def validate_async(self, data, loop=None, executor=None, max_errors=1):
+        """Validate the data in an executor, without blocking the event
+        loop.
+
+        Requires :mod:`asyncio` (or `trollius` on Python 2). Small
+        documents are usually cheaper to validate with :meth:`validate`.
+
+        :param loop: event loop; the current one by default.
+        :param executor: executor to run the validation in; the loop
+                         default executor by default.
+        :param max_errors: see :meth:`validate`.
+        :return: a future resolving to None or raising the validation
+                 error.
+
+        """
+        loop = loop or asyncio.get_event_loop()
+        return loop.run_in_executor(
+            executor, self.validate, data, max_errors
+        )
+
+    def _compile(self):
+        schema = self._schema
+        id = self._id
+        linked = schema._linked(schema._compiled, id)
+        if linked is not None:
+            return linked
+
+        def check(instance):
+            return schema._check(id)(instance)
+        return check
+
+    def _compile_batch(self):
+        schema = self._schema
+        id = self._id
+        linked = schema._linked(schema._compiled_batch, id)
+        if linked is not None:
+            return linked
+
+        def check(values):
+            return schema._batch_check(id)(values)
+        return check
+
+    def _to_dict(self):
+        schema = super(Ref, self)._to_dict()
         schema['$ref'] = '#/definitions/%s' % self._id
         return schema
+
+
+def _gzip(data):
+    """Compress data; the output doesn't depend on the time."""
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def _references(schema):
+    """Yield the ids of the definitions a serialized schema references.
+
+    """
+    stack = [schema]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if (
+                isinstance(ref, basestring) and
+                ref.startswith(utils.DEF_PREFIX)
+            ):
+                yield utils.definition_path(ref)[0]
+            stack.extend(node.itervalues())
+        elif isinstance(node, (list, tuple,)):
+            stack.extend(node)
+
+
+def _components(definitions, id):
+    """Return the reference cycles of the definitions reachable from the
+    `id` one.
+
+    Returns the strongly connected components of the reference graph
+    (Tarjan's algorithm), dependencies first: a definition only
+    references definitions of its own component or of the previous
+    ones. Also returns the graph, as a dict of definition id to the
+    ids it references, and the list of (referrer, id) references to
+    undefined definitions.
+
+    """
+    graph = {}
+    dangling = []
+    order = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    components = []
+    work = [(id, None)]
+    while work:
+        current, refs = work.pop()
+        if refs is None:
+            order[current] = low[current] = len(order)
+            stack.append(current)
+            on_stack.add(current)
+            graph[current] = set(_references(definitions[current]))
+            refs = iter(sorted(graph[current]))
+
+        for ref in refs:
+            if ref not in definitions:
+                dangling.append((current, ref))
+            elif ref not in order:
+                work.append((current, refs))
+                work.append((ref, None))
+                break
+            elif ref in on_stack:
+                low[current] = min(low[current], order[ref])
+        else:
+            if low[current] == order[current]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == current:
+                        break
+                components.append(component)
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[current])
+    return components, graph, dangling
+
+
+def _unresolvable(id, referrer=None):
+    message = "Unresolvable JSON pointer: %r" % ("definitions/%s" % id)
+    if referrer is not None:
+        message += " (referenced by %r)" % (referrer,)
+    return jsonschema.RefResolutionError(message)
+
+
+def _dependencies(definitions, id):
+    """Return the ids of the definitions reachable from the `id` one,
+    including `id` itself and ids referenced but not (yet) defined.
+
+    """
+    deps = set()
+    stack = [id]
+    while stack:
+        current = stack.pop()
+        if current in deps:
+            continue
+        deps.add(current)
+        if current in definitions:
+            stack.extend(_references(definitions[current]))
+    return deps
@@ -0,0 +1,227 @@
+"""Incrementally parse and validate large JSON arrays.
+
+"""
+import codecs
+import json
+import json.scanner
+import re
+
+from . import compiler
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+_ERROR_POSITION = re.compile(r"\(char (\d+)")
+
+# an error this close to the end of the buffer might be caused by a
+# truncated token (a literal, an escape sequence...).
+_TRUNCATION_MARGIN = 16
+
+# errors raised when a string runs up to the end of the buffer.
+_TRUNCATION_ERRORS = ("Unterminated string", "end is out of bounds",)
+
+
+def iter_array(stream, chunk_size=65536, encoding="utf-8"):
+    """Lazily yield the items of a JSON array.
+
+    Only the item being parsed is kept in memory.
+
+    :param stream: a file object, or an iterable of strings.
+    :param chunk_size: size of the reads from a file object.
+    :param encoding: encoding of byte strings.
+    :raise ValueError: if the document is not a well formed JSON array.
+
+    """
+    if hasattr(stream, "read"):
+        chunks = iter(lambda: stream.read(chunk_size), "")
+    else:
+        chunks = iter(stream)
+    return _Parser(chunks, encoding).items()
+
+
+class _Parser(object):
+
+    def __init__(self, chunks, encoding):
+        self._chunks = chunks
+        self._decode = codecs.getincrementaldecoder(encoding)().decode
+        self._decoder = json.JSONDecoder()
+        # the pure python scanner reports where nested values fail.
+        self._locator = json.JSONDecoder()
+        self._locator.scan_once = json.scanner.py_make_scanner(
+            self._locator
+        )
+        self._buffer = u""
+        self._pos = 0
+        self._eof = False
+
+    def items(self):
+        if self._next_char() != u"[":
+            raise ValueError("Expecting a JSON array")
+        self._pos += 1
+        if self._next_char() == u"]":
+            self._pos += 1
+            self._expect_end()
+            return
+
+        while True:
+            yield self._value()
+            char = self._next_char()
+            self._pos += 1
+            if char == u"]":
+                break
+            if char != u",":
+                raise ValueError("Expecting ',' delimiter or ']'")
+            self._next_char()
+        self._expect_end()
+
+    def _fill(self):
+        """Read the next chunk; return False once the stream is
+        exhausted.
+
+        """
+        for chunk in self._chunks:
+            if not isinstance(chunk, unicode):
+                chunk = self._decode(chunk)
+            if chunk:
+                self._buffer = self._buffer[self._pos:] + chunk
+                self._pos = 0
+                return True
+        self._eof = True
+        return False
+
+    def _next_char(self):
+        """Skip whitespaces and return the next character, or an empty
+        string at the end of the stream.
+
+        """
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return u""
+
+    def _value(self):
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(
+                    self._buffer, self._pos
+                )
+            except ValueError as e:
+                if not self._truncated(e) or not self._fill():
+                    raise
+                continue
+            # a number at the end of the buffer might be truncated.
+            tail = _NUMBER_TAIL.match(self._buffer, end).end()
+            if tail == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _truncated(self, error):
+        """Tell if a decoding error might be caused by the end of the
+        buffer, rather than by a malformed value.
+
+        """
+        if self._eof:
+            return False
+        position = _error_position(error)
+        if position is None:
+            # the C scanner doesn't tell where a nested value failed.
+            try:
+                self._locator.raw_decode(self._buffer, self._pos)
+            except ValueError as e:
+                error = e
+                position = _error_position(e)
+        if str(error).startswith(_TRUNCATION_ERRORS):
+            return True
+        if position is None:
+            position = self._pos
+        return len(self._buffer) - position <= _TRUNCATION_MARGIN
+
+    def _expect_end(self):
+        if self._next_char():
+            raise ValueError("Extra data after the JSON array")
+
+
+def _error_position(error):
+    """Return the position of a decoding error, if known."""
+    position = getattr(error, "pos", None)
+    if position is None:
+        match = _ERROR_POSITION.search(str(error))
+        if match:
+            position = int(match.group(1))
+    return position
+
+
+def validate_array(array, items):
+    """Validate the items of an array one by one.
+
+    Only the `items`, `additional_items`, `min`, `max` and `is_set`
+    constraints of the array are checked. Uniqueness is checked with a
+    set of the items canonical keys.
+
+    :param array: the :class:`schemabuilder.Array` definition.
+    :param items: iterable of the array items.
+    :return: generator of :class:`jsonschema.ValidationError`, with the
+             item index as first element of their path.
+
+    """
+    checks = []
+    extra = None
+    extra_path = ()
+    if isinstance(array.items, (list, tuple,)):
+        checks = [compiler.compile_node(i) for i in array.items]
+        if getattr(array, "additional_items", True) is False:
+            extra = _no_additional_item
+    elif array.items is not None:
+        extra = compiler.compile_node(array.items)
+        extra_path = ("items",)
+
+    seen = set() if getattr(array, "unique_items", False) else None
+    count = 0
+    for index, item in enumerate(items):
+        count += 1
+        if array.max_items is not None and count == array.max_items + 1:
+            yield compiler._error(
+                "maxItems", array.max_items, None,
+                "array is too long (more than %d items)" % array.max_items
+            )
+
+        if index < len(checks):
+            errors = compiler._descend(
+                checks[index](item), index, "items", index
+            )
+        elif extra is not None:
+            errors = compiler._descend(extra(item), index, *extra_path)
+        else:
+            errors = ()
+        for error in errors:
+            yield error
+
+        if seen is not None:
+            key = compiler.json_key(item)
+            if key in seen:
+                error = compiler._error(
+                    "uniqueItems", True, item,
+                    "%r is a duplicated element" % (item,)
+                )
+                error.path.appendleft(index)
+                yield error
+            else:
+                seen.add(key)
+
+    if array.min_items is not None and count < array.min_items:
+        yield compiler._error(
+            "minItems", array.min_items, None,
+            "array is too short (%d items)" % count
+        )
+
+
+def _no_additional_item(item):
+    return (
+        compiler._error(
+            "additionalItems", False, item,
+            "Additional items are not allowed (%r was unexpected)" % (item,)
+        ),
+    )
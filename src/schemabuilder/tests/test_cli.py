@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from .. import cli
+from .. import primitives
+from .. import schema
+from . import utils
+
+
+users = schema.Schema()
+users.define("user", primitives.Object(properties={
+    "name": primitives.Str(required=True),
+    "age": primitives.Int(min=0),
+}))
+
+
+class TestCli(utils.TestCase):
+
+    records = (
+        '{"name": "bob"}\n'
+        '\n'
+        '{"name": "alice", "age": -1}\n'
+        '{"age": 1}\n'
+        'not json\n'
+    )
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.data = os.path.join(self.dir, "users.ndjson")
+        with open(self.data, "w") as f:
+            f.write(self.records)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_cli(self, *argv):
+        stdout, stderr = io.BytesIO(), io.BytesIO()
+        status = cli.main(list(argv), stdout=stdout, stderr=stderr)
+        return status, stdout.getvalue().splitlines(), stderr.getvalue()
+
+    def assertReport(self, path, status, lines, summary):
+        self.assertEqual(1, status)
+        self.assertEqual(
+            "%s:3: /age: -1 is less than the minimum of 0" % path, lines[0]
+        )
+        self.assertTrue(lines[1].startswith("%s:4: /: " % path))
+        self.assertTrue(lines[1].endswith("'name' is a required property"))
+        self.assertTrue(lines[2].startswith("%s:5: /: Invalid record" % path))
+        self.assertEqual(3, len(lines))
+        self.assertTrue(summary.startswith("4 records, 3 invalid"))
+
+    def test_module_schema(self):
+        status, lines, summary = self.run_cli(
+            "schemabuilder.tests.test_cli:users", "user", self.data
+        )
+        self.assertReport(self.data, status, lines, summary)
+
+    def test_json_schema(self):
+        path = os.path.join(self.dir, "schema.json")
+        with open(path, "w") as f:
+            json.dump(users.to_dict(), f)
+        status, lines, summary = self.run_cli(path, "user", self.data)
+        self.assertReport(self.data, status, lines, summary)
+
+    def test_processes(self):
+        status, lines, summary = self.run_cli(
+            "schemabuilder.tests.test_cli:users", "user", self.data,
+            "-p", "2", "--chunk-size", "1"
+        )
+        self.assertReport(self.data, status, lines, summary)
+
+    def test_stdin(self):
+        stdout, stderr = io.BytesIO(), io.BytesIO()
+        status = cli.main(
+            ["schemabuilder.tests.test_cli:users", "user"],
+            stdin=io.BytesIO(self.records), stdout=stdout, stderr=stderr
+        )
+        self.assertReport(
+            "-", status, stdout.getvalue().splitlines(), stderr.getvalue()
+        )
+
+    def test_valid(self):
+        with open(self.data, "w") as f:
+            f.write('{"name": "bob"}\n')
+        status, lines, summary = self.run_cli(
+            "schemabuilder.tests.test_cli:users", "user", self.data
+        )
+        self.assertEqual((0, []), (status, lines))
+
+    def test_max_errors(self):
+        with open(self.data, "w") as f:
+            f.write('{"age": -1}\n')
+        for argv, count in (((), 2), (("--max-errors", "1"), 1)):
+            status, lines, summary = self.run_cli(
+                "schemabuilder.tests.test_cli:users", "user", self.data, *argv
+            )
+            self.assertEqual((1, count), (status, len(lines)))
+
+    def test_max_errors_below_one(self):
+        for value in ("0", "-1"):
+            with self.assertRaises(SystemExit) as ctx:
+                self.run_cli(
+                    "schemabuilder.tests.test_cli:users", "user", self.data,
+                    "--max-errors", value
+                )
+            self.assertEqual(2, ctx.exception.code)
+
+    def test_unknown_definition(self):
+        status, lines, summary = self.run_cli(
+            "schemabuilder.tests.test_cli:users", "group", self.data
+        )
+        self.assertEqual(2, status)
@@ -0,0 +1,208 @@
+import imp
+import os
+import shutil
+import tempfile
+
+from .. import codegen
+from .. import primitives
+from .. import schema
+from . import utils
+
+
+def load(source):
+    module = imp.new_module("generated")
+    exec compile(source, "<generated>", "exec") in module.__dict__
+    return module
+
+
+class TestGenerate(utils.TestCase):
+
+    def setUp(self):
+        self.schema = schema.Schema()
+        self.name = self.schema.define(
+            "name", primitives.Str(min=2, pattern="^[a-z]+$")
+        )
+        self.schema.define("user", primitives.Object(
+            properties={
+                "name": self.name(required=True),
+                "email": primitives.Str(dependencies=["name"]),
+                "age": primitives.Int(min=0, exclusive_min=True),
+                "tags": primitives.Array(
+                    items=primitives.Str(), max=2, is_set=True
+                ),
+                "role": primitives.Generic(enum=["admin", 1]),
+            },
+            pattern_properties={"^x-": primitives.Number(multiple_of=0.5)},
+            additional_properties=False,
+        ))
+
+    def assertSameValidity(self, module, id, instances):
+        reference = self.schema.validator(id)
+        for instance in instances:
+            try:
+                module.validate(id, instance)
+                valid = True
+            except module.ValidationError:
+                valid = False
+            self.assertEqual(
+                reference.is_valid(instance), valid,
+                "%r / %r" % (id, instance,)
+            )
+
+    def test_standalone(self):
+        source = codegen.generate(self.schema)
+        self.assertNotIn("schemabuilder", source.replace(
+            "generated by schemabuilder", ""
+        ))
+        self.assertNotIn("jsonschema", source)
+        self.assertIn("_PATTERN", source)
+
+    def test_user(self):
+        module = load(codegen.generate(self.schema))
+        self.assertSameValidity(module, "user", [
+            {"name": "bob"},
+            {},
+            {"name": "b"},
+            {"name": "Bob"},
+            {"name": 1},
+            {"email": "bob@example.com"},
+            {"name": "bob", "age": 1},
+            {"name": "bob", "age": 0},
+            {"name": "bob", "age": True},
+            {"name": "bob", "tags": ["a", "b"]},
+            {"name": "bob", "tags": ["a", "a"]},
+            {"name": "bob", "tags": ["a", "b", "c"]},
+            {"name": "bob", "tags": [1]},
+            {"name": "bob", "role": "admin"},
+            {"name": "bob", "role": "user"},
+            {"name": "bob", "x-score": 1.5},
+            {"name": "bob", "x-score": 1.2},
+            {"name": "bob", "other": 1},
+            [],
+        ])
+
+    def test_error(self):
+        module = load(codegen.generate(self.schema))
+        with self.assertRaises(module.ValidationError) as ctx:
+            module.validate_user({"name": "bob", "tags": ["a", 1]})
+        self.assertEqual(["tags", 1], ctx.exception.path)
+        self.assertEqual("type", ctx.exception.validator)
+
+    def test_combinators(self):
+        self.schema.define("id", {
+            "anyOf": [{"type": "integer"}, {"type": "string"}],
+        })
+        self.schema.define("one", {
+            "oneOf": [{"type": "number"}, {"type": "integer"}],
+        })
+        self.schema.define("pair", {
+            "type": "array",
+            "items": [{"$ref": "#/definitions/id"}, {"type": "boolean"}],
+            "additionalItems": False,
+        })
+        module = load(codegen.generate(self.schema))
+        self.assertSameValidity(module, "id", [1, "a", 1.5, None])
+        self.assertSameValidity(module, "one", [1, 1.5, "a"])
+        self.assertSameValidity(module, "pair", [
+            [1, True], ["a"], [1.5, True], [1, 1], [1, True, 2], {},
+        ])
+
+    def test_recursive(self):
+        self.schema.define("tree", {
+            "type": "object",
+            "properties": {
+                "children": {
+                    "type": "array", "items": {"$ref": "#/definitions/tree"},
+                },
+            },
+        })
+        module = load(codegen.generate(self.schema))
+        self.assertSameValidity(module, "tree", [
+            {"children": [{"children": []}]},
+            {"children": [{"children": [1]}]},
+        ])
+
+    def test_percent_in_messages(self):
+        self.schema.define("ratio", primitives.Str(pattern="^[0-9]+%$"))
+        self.schema.define("level", primitives.Str(enum=["50%", "100%s"]))
+        module = load(codegen.generate(self.schema))
+        self.assertSameValidity(module, "ratio", ["50%", "50"])
+        self.assertSameValidity(module, "level", ["50%", "50"])
+        with self.assertRaises(module.ValidationError) as ctx:
+            module.validate("ratio", "50")
+        self.assertIn("'^[0-9]+%$'", ctx.exception.message)
+
+    def test_name_collision(self):
+        self.schema.define("a_b", primitives.Str())
+        self.schema.define("a~b", primitives.Int())
+        module = load(codegen.generate(self.schema))
+        self.assertSameValidity(module, "a_b", ["a", 1])
+        self.assertSameValidity(module, "a~b", ["a", 1])
+
+    def test_pointer_ref(self):
+        self.schema.define("nick", {
+            "$ref": "#/definitions/user/properties/name",
+        })
+        self.schema.define("tag", {
+            "$ref": "#/definitions/user/properties/tags/items",
+        })
+        module = load(codegen.generate(self.schema))
+        self.assertSameValidity(module, "nick", ["bob", "b", 1])
+        self.assertSameValidity(module, "tag", ["a", 1])
+
+        self.schema.define("broken", {
+            "$ref": "#/definitions/user/properties/missing",
+        })
+        self.assertRaises(ValueError, codegen.generate, self.schema)
+
+    def test_unsupported_keyword(self):
+        self.schema.define("other", {
+            "type": "object", "not": {"required": ["z"]},
+        })
+        self.assertRaises(ValueError, codegen.generate, self.schema)
+
+    def test_format(self):
+        values = {
+            "email": ["bob@example.com", "bad", 1],
+            "hostname": ["example.com", "-bad", 1],
+            "uri": ["http://example.com/", "bad", 1],
+            "ipv4": ["127.0.0.1", "127.0.0.256", 1],
+            "ipv6": ["::1", "::g", 1],
+            "date-time": [
+                "2016-02-29T12:00:00Z", "2015-02-29T12:00:00Z", "bad", 1,
+            ],
+            "regex": ["^a+$", "(", 1],
+        }
+        for format in values:
+            self.schema.define(format, {"format": format})
+        module = load(codegen.generate(self.schema))
+        for format, instances in values.items():
+            self.assertSameValidity(module, format, instances)
+
+        self.schema.define("email_str", primitives.Str(format="email"))
+        module = load(codegen.generate(self.schema))
+        self.assertSameValidity(module, "email_str", ["a@b.c", "bad"])
+        with self.assertRaises(module.ValidationError) as ctx:
+            module.validate("email_str", "bad")
+        self.assertEqual("format", ctx.exception.validator)
+
+    def test_unsupported_format(self):
+        self.schema.define("other", primitives.Str(format="unknown"))
+        self.assertRaises(ValueError, codegen.generate, self.schema)
+
+    def test_dangling_ref(self):
+        self.schema.define("broken", {"$ref": "#/definitions/missing"})
+        self.assertRaises(ValueError, codegen.generate, self.schema)
+
+    def test_write(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, "validators.py")
+        codegen.write(self.schema, path)
+        module = imp.load_source("validators_test", path)
+        self.assertRaises(module.ValidationError, module.validate_name, "a")
+        self.assertIsNone(module.validate_name("ab"))
+
+    def test_serialized(self):
+        module = load(codegen.generate(self.schema.to_dict()))
+        self.assertEqual(["name", "user"], sorted(module.VALIDATORS))
@@ -0,0 +1,533 @@
+import threading
+import unittest
+
+import jsonschema
+
+from .. import compiler
+from .. import primitives
+from .. import schema
+from .. import utils as jsb_utils
+from . import utils
+
+
+class TestCompile(utils.TestCase):
+
+    def assertSameValidity(self, primitive, instances):
+        compiled = primitive.compile()
+        reference = jsonschema.Draft4Validator(primitive.to_dict())
+        for instance in instances:
+            self.assertEqual(
+                reference.is_valid(instance),
+                compiled.is_valid(instance),
+                "%r / %r" % (primitive.to_dict(), instance,)
+            )
+
+    def test_generic(self):
+        self.assertSameValidity(
+            primitives.Generic(enum=[1, "a", [1]]),
+            [1, 1.0, "a", "b", [1], None]
+        )
+
+    def test_enum_bool(self):
+        v = primitives.Generic(enum=[1, 0]).compile()
+        self.assertTrue(v.is_valid(1.0))
+        self.assertFalse(v.is_valid(True))
+        self.assertFalse(v.is_valid(False))
+
+    def test_enum_json_equality(self):
+        values = [{"a": 1}, [1, {"b": True}], "x"] + range(1000)
+        for v in (
+            primitives.Generic(enum=values).compile(),
+            compiler.Draft4Validator({"enum": values}),
+        ):
+            self.assertTrue(v.is_valid({"a": 1.0}))
+            self.assertFalse(v.is_valid({"a": True}))
+            self.assertTrue(v.is_valid([1, {"b": True}]))
+            self.assertFalse(v.is_valid([1, {"b": 1}]))
+            self.assertTrue(v.is_valid(999.0))
+            self.assertFalse(v.is_valid(True))
+            self.assertFalse(v.is_valid("y"))
+
+    def test_enum_cache_eviction(self):
+        hot = range(5000)
+        keys = compiler._enum_index(hot)
+        lists = [[i] for i in range(2 * compiler._ENUM_CACHE_SIZE)]
+        for values in lists:
+            self.assertIs(keys, compiler._enum_index(hot))
+            compiler._enum_index(values)
+        self.assertIs(keys, compiler._enum_index(hot))
+        self.assertLessEqual(
+            len(compiler._enum_cache), compiler._ENUM_CACHE_SIZE
+        )
+
+    def test_unique_items(self):
+        big = range(20000)
+        for v in (
+            primitives.Array(is_set=True).compile(),
+            compiler.Draft4Validator({"uniqueItems": True}),
+        ):
+            self.assertTrue(v.is_valid(big))
+            self.assertFalse(v.is_valid(big + [0]))
+            self.assertTrue(v.is_valid([1, True, 0, False]))
+            self.assertFalse(v.is_valid([1, 1.0]))
+            self.assertTrue(v.is_valid([{"a": [1]}, {"a": [True]}]))
+            self.assertFalse(v.is_valid([{"a": [1]}, {"a": [1.0]}]))
+            self.assertFalse(v.is_valid([[1, {"b": 2}], "x", [1, {"b": 2}]]))
+
+    def test_str(self):
+        self.assertSameValidity(
+            primitives.Str(min=2, max=4, pattern="^[a-z]+$"),
+            ["a", "ab", "abcd", "abcde", "AB", 1, None, u"abc"]
+        )
+
+    def test_null_allowed(self):
+        self.assertSameValidity(
+            primitives.Str(min=2, null_allowed=True),
+            ["a", "ab", None, 1]
+        )
+
+    def test_number(self):
+        self.assertSameValidity(
+            primitives.Number(
+                min=1, max=10, exclusive_max=True, multiple_of=0.5
+            ),
+            [0, 1, 1.5, 1.2, 9.5, 10, True, "1", None]
+        )
+
+    def test_int(self):
+        self.assertSameValidity(
+            primitives.Int(min=0, exclusive_min=True, multiple_of=2),
+            [0, 2, 3, 4.0, 2.5, -2, True, long(4)]
+        )
+
+    def test_bool(self):
+        self.assertSameValidity(primitives.Bool(), [True, False, 0, None])
+
+    def test_object(self):
+        o = primitives.Object(
+            properties={
+                "name": primitives.Str(required=True),
+                "email": primitives.Str(dependencies=["name"]),
+            },
+            pattern_properties={"^x-": primitives.Int()},
+            additional_properties=False,
+            min=1,
+            max=3,
+        )
+        self.assertSameValidity(o, [
+            {"name": "bob"},
+            {"name": 1},
+            {},
+            {"email": "bob@example.com"},
+            {"name": "bob", "x-age": 1},
+            {"name": "bob", "x-age": "1"},
+            {"name": "bob", "age": 1},
+            {"name": "bob", "x-a": 1, "x-b": 2, "x-c": 3},
+            [],
+        ])
+
+    def test_additional_properties_schema(self):
+        self.assertSameValidity(
+            primitives.Object(
+                properties={"name": primitives.Str()},
+                additional_properties=primitives.Int(),
+            ),
+            [{"name": "bob", "age": 1}, {"name": "bob", "age": "1"}]
+        )
+
+    def test_additional_properties_empty_schema(self):
+        self.assertSameValidity(
+            primitives.Object(
+                properties={"name": primitives.Str()},
+                additional_properties={},
+            ),
+            [{"name": "bob", "age": 1}, {"name": 1}]
+        )
+
+    def test_array(self):
+        self.assertSameValidity(
+            primitives.Array(items=primitives.Int(), min=1, max=3, is_set=True),
+            [[], [1], [1, 2, 3], [1, 2, 3, 4], [1, 1], [1, True], ["1"], {}]
+        )
+
+    def test_tuple(self):
+        self.assertSameValidity(
+            primitives.Array(
+                items=(primitives.Str(), primitives.Int()),
+                additional_items=False
+            ),
+            [["a", 1], ["a"], ["a", "b"], ["a", 1, 2]]
+        )
+
+    def test_combinators(self):
+        with_name = primitives.Object(
+            properties={"name": primitives.Str(required=True)}
+        )
+        with_email = primitives.Object(
+            properties={"email": primitives.Str(required=True)}
+        )
+        instances = [
+            {"name": "bob"},
+            {"email": "bob@example.com"},
+            {"name": "bob", "email": "bob@example.com"},
+            {},
+        ]
+        for key in ("one_of", "any_of", "all_of",):
+            self.assertSameValidity(
+                primitives.Object(**{key: (with_name, with_email,)}),
+                instances
+            )
+
+    def test_error_path(self):
+        o = primitives.Object(properties={
+            "tags": primitives.Array(items=primitives.Str())
+        })
+        error = next(o.compile().iter_errors({"tags": ["a", 1]}))
+        self.assertEqual(["tags", 1], list(error.path))
+        self.assertEqual(
+            ["properties", "tags", "items", "type"],
+            list(error.schema_path)
+        )
+        self.assertEqual("type", error.validator)
+
+    def test_validate(self):
+        v = primitives.Str().compile()
+        v.validate("bob")
+        self.assertRaises(jsonschema.ValidationError, v.validate, 1)
+
+
+class TestDraft4Validator(utils.TestCase):
+
+    def assertSameErrors(self, schema, instance):
+        expected = jsonschema.Draft4Validator(schema).iter_errors(instance)
+        errors = compiler.Draft4Validator(schema).iter_errors(instance)
+        self.assertEqual(
+            sorted((e.message, list(e.path)) for e in expected),
+            sorted((e.message, list(e.path)) for e in errors),
+        )
+
+    def test_pattern(self):
+        schema = {"pattern": "^[a-z]+$"}
+        for instance in ("abc", "aBc", 1):
+            self.assertSameErrors(schema, instance)
+
+    def test_properties(self):
+        schema = {
+            "properties": {"name": {}},
+            "patternProperties": {"^x-": {"type": "integer"}},
+        }
+        for additional in (False, {"type": "string"}):
+            schema["additionalProperties"] = additional
+            self.assertSameErrors(
+                schema, {"name": 1, "x-a": "a", "x-b": 1, "other": 1}
+            )
+        del schema["patternProperties"]
+        schema["additionalProperties"] = False
+        self.assertSameErrors(schema, {"name": 1, "other": 1})
+
+
+@unittest.skipIf(compiler.numpy is None, "numpy is not installed")
+class TestNumericItems(utils.TestCase):
+
+    def assertSameErrors(self, item, instance):
+        array = primitives.Array(items=item)
+        expected = compiler.items(item._compile())(instance)
+        errors = array.compile().iter_errors(instance)
+        self.assertEqual(
+            [(e.message, list(e.path)) for e in expected],
+            [(e.message, list(e.path)) for e in errors],
+        )
+
+    def test_vectorized(self):
+        self.assertTrue(primitives.Number(min=0)._vectorizable())
+        self.assertFalse(primitives.Number(enum=[1])._vectorizable())
+        self.assertFalse(
+            primitives.Number(null_allowed=True)._vectorizable()
+        )
+
+    def test_number(self):
+        item = primitives.Number(
+            min=0, max=10, exclusive_max=True, multiple_of=0.5
+        )
+        data = [(i % 20) / 2.0 for i in range(1000)]
+        self.assertTrue(primitives.Array(items=item).compile().is_valid(data))
+        data[3], data[500], data[999] = -1, 10, 2.25
+        self.assertSameErrors(item, data)
+
+    def test_int(self):
+        item = primitives.Int(min=0, exclusive_min=True, multiple_of=3)
+        data = range(3, 3000, 3)
+        self.assertSameErrors(item, data)
+        data[10], data[20] = 0, 7
+        self.assertSameErrors(item, data)
+        data[30] = 3.0
+        self.assertSameErrors(item, data)
+
+    def test_large_ints(self):
+        item = primitives.Number(max=2 ** 53)
+        for size in (10, 300):
+            self.assertSameErrors(item, [1] * (size - 1) + [2 ** 53 + 1])
+            self.assertSameErrors(item, [1.5] * (size - 1) + [-2 ** 60])
+
+    def test_mixed_types(self):
+        item = primitives.Number(max=5)
+        data = [1] * 500
+        for value in (True, "1", None, 6, 2 ** 70):
+            self.assertSameErrors(item, data + [value])
+
+
+class TestSchemaCompile(utils.TestCase):
+
+    def setUp(self):
+        self.schema = schema.Schema()
+        name = self.schema.define("name", primitives.Str())
+        self.schema.define(
+            "user",
+            primitives.Object(properties={"name": name(required=True)})
+        )
+
+    def test_compile(self):
+        v = self.schema.compile("user")
+        self.assertTrue(v.is_valid({"name": "bob"}))
+        self.assertFalse(v.is_valid({"name": 1}))
+        self.assertFalse(v.is_valid({}))
+
+    def test_redefine(self):
+        v = self.schema.compile("user")
+        self.schema.define("name", primitives.Int())
+        self.assertTrue(v.is_valid({"name": 1}))
+        self.assertFalse(v.is_valid({"name": "bob"}))
+
+    def test_dict_definition(self):
+        self.schema.define("tags", {
+            "type": "array",
+            "items": {"$ref": "#/definitions/name"},
+        })
+        v = self.schema.compile("tags")
+        self.assertTrue(v.is_valid(["a"]))
+        self.assertFalse(v.is_valid([1]))
+
+        self.schema.define("name", primitives.Int())
+        self.assertTrue(v.is_valid([1]))
+        self.assertFalse(v.is_valid(["a"]))
+
+    def test_dict_definition_pool(self):
+        resolvers = []
+
+        def resolver():
+            resolvers.append(self.schema.ref_resolver())
+            return resolvers[-1]
+
+        check = compiler.from_dict(
+            {"type": "array", "items": {"$ref": "#/definitions/name"}},
+            resolver
+        )
+        for _ in range(3):
+            self.assertEqual([], list(check(["a"])))
+        self.assertEqual(1, len(resolvers))
+
+        pending = check([1, 2])
+        self.assertEqual(1, len(list(check([1]))))
+        self.assertEqual(2, len(list(pending)))
+        self.assertEqual(2, len(resolvers))
+
+    def test_dangling_ref(self):
+        self.assertRaises(
+            jsonschema.RefResolutionError,
+            self.schema.compile,
+            "email"
+        )
+
+    def test_dangling_nested_ref(self):
+        self.schema.define("users", primitives.Array(
+            items=self.schema.ref("admin")
+        ))
+        with self.assertRaises(jsonschema.RefResolutionError) as ctx:
+            self.schema.compile("users")
+        self.assertIn("admin", str(ctx.exception))
+        self.assertIn("users", str(ctx.exception))
+
+    def test_ref_into_definition(self):
+        self.schema.define("nick", {
+            "$ref": "#/definitions/user/properties/name",
+        })
+        v = self.schema.compile("nick")
+        self.assertTrue(v.is_valid("bob"))
+        self.assertFalse(v.is_valid(1))
+        self.assertEqual(
+            [[], [[]]],
+            [
+                [list(e.path) for e in errors]
+                for errors in self.schema.validate_batch("nick", ["a", 1])
+            ],
+        )
+
+    def test_linked_refs(self):
+        check = self.schema._check("name")
+        self.schema._linker = threading.current_thread()
+        try:
+            self.assertIs(check, self.schema.ref("name")._compile())
+        finally:
+            self.schema._linker = None
+        self.assertIsNot(check, self.schema.ref("name")._compile())
+
+    def test_redefine_referenced(self):
+        self.schema.define("users", primitives.Array(
+            items=self.schema.ref("user")
+        ))
+        v = self.schema.compile("users")
+        self.assertTrue(v.is_valid([{"name": "bob"}]))
+        self.schema.define("name", primitives.Int())
+        self.assertNotIn("user", self.schema._compiled)
+        self.assertNotIn("users", self.schema._compiled)
+        self.assertTrue(v.is_valid([{"name": 1}]))
+        self.assertFalse(v.is_valid([{"name": "bob"}]))
+
+    def test_cycle(self):
+        self.schema.define("node", primitives.Object(properties={
+            "value": self.schema.ref("name"),
+            "children": primitives.Array(items=self.schema.ref("node")),
+        }))
+        v = self.schema.compile("node")
+        self.assertTrue(v.is_valid({"children": [{"children": []}]}))
+        self.assertFalse(v.is_valid({"children": [{"value": 1}]}))
+        self.assertEqual(
+            [[], [["children", 0, "value"]]],
+            [
+                [list(e.path) for e in errors]
+                for errors in self.schema.validate_batch("node", [
+                    {"value": "a"}, {"children": [{"value": 1}]},
+                ])
+            ],
+        )
+
+    def test_long_chain(self):
+        ref = self.schema.define("d0", primitives.Str())
+        for i in range(1, 2000):
+            ref = self.schema.define("d%d" % i, primitives.Object(
+                properties={"next": ref}
+            ))
+        self.assertTrue(self.schema.compile("d1999").is_valid({}))
+
+
+class TestComponents(utils.TestCase):
+
+    def components(self, graph, id):
+        definitions = dict(
+            (k, {"items": [{"$ref": "#/definitions/%s" % r} for r in v]})
+            for k, v in graph.iteritems()
+        )
+        components, _, dangling = schema._components(definitions, id)
+        return [sorted(c) for c in components], dangling
+
+    def test_acyclic(self):
+        self.assertEqual(
+            ([["c"], ["b"], ["a"]], []),
+            self.components({"a": "bc", "b": "c", "c": ""}, "a"),
+        )
+
+    def test_cycles(self):
+        self.assertEqual(
+            ([["d"], ["b", "c"], ["a"]], []),
+            self.components(
+                {"a": "ab", "b": "c", "c": "bd", "d": "", "e": "a"}, "a"
+            ),
+        )
+
+    def test_dangling(self):
+        self.assertEqual(
+            ([["a"]], [("a", "x")]),
+            self.components({"a": "x"}, "a"),
+        )
+
+    def test_definition_path(self):
+        self.assertEqual(["a"], jsb_utils.definition_path("#/definitions/a"))
+        self.assertEqual(
+            ["a", "properties", "x"],
+            jsb_utils.definition_path("#/definitions/a/properties/x"),
+        )
+        self.assertEqual(
+            ["a/b~c", "items"],
+            jsb_utils.definition_path("#/definitions/a~1b~0c/items"),
+        )
+        self.assertEqual(
+            ["a b"], jsb_utils.definition_path("#/definitions/a%20b")
+        )
+
+
+class TestValidateBatch(utils.TestCase):
+
+    def setUp(self):
+        self.schema = schema.Schema()
+        self.schema.define("name", primitives.Str(min=1))
+        self.schema.define("user", primitives.Object(
+            properties={
+                "name": self.schema.ref("name")(required=True),
+                "age": primitives.Int(min=0),
+                "score": primitives.Number(max=1),
+                "address": primitives.Object(
+                    properties={"city": primitives.Str(required=True)},
+                ),
+                "tags": primitives.Array(items=primitives.Str()),
+            },
+            additional_properties=False,
+        ))
+
+    def assertSameErrors(self, id, records):
+        validator = self.schema.compile(id)
+        results = self.schema.validate_batch(id, records)
+        self.assertEqual(len(records), len(results))
+        for record, errors in zip(records, results):
+            self.assertEqual(
+                sorted(
+                    (e.message, list(e.path), list(e.schema_path))
+                    for e in validator.iter_errors(record)
+                ),
+                sorted(
+                    (e.message, list(e.path), list(e.schema_path))
+                    for e in errors
+                ),
+            )
+
+    def test_valid(self):
+        records = [
+            {"name": "bob", "age": i, "score": 0.5, "tags": ["a"]}
+            for i in range(300)
+        ]
+        self.assertEqual(
+            [[]] * 300, self.schema.validate_batch("user", records)
+        )
+
+    def test_errors(self):
+        records = [
+            {"name": "bob", "age": i, "score": i / 300.0}
+            for i in range(300)
+        ]
+        records[1]["age"] = -1
+        records[2]["score"] = True
+        del records[3]["name"]
+        records[4]["name"] = ""
+        records[5]["address"] = {}
+        records[6]["address"] = {"city": 1}
+        records[7]["tags"] = ["a", 2]
+        records[8]["other"] = 1
+        records[9] = "bob"
+        records[10] = None
+        self.assertSameErrors("user", records)
+
+    def test_small_batch(self):
+        self.assertSameErrors("user", [{"age": -1}, {"name": "bob"}, []])
+
+    def test_non_object_definition(self):
+        self.assertSameErrors("name", ["", "bob", 1])
+
+    def test_redefine(self):
+        self.assertSameErrors("user", [{"name": "a"}])
+        self.schema.define("name", primitives.Str(min=2))
+        self.assertSameErrors("user", [{"name": "a"}, {"name": "ab"}])
+
+    def test_stats(self):
+        self.schema.validate_batch("user", [{"name": "bob"}, {}])
+        stats = self.schema.stats()["user"]
+        self.assertEqual(2, stats.validations)
+        self.assertEqual(1, stats.failures)
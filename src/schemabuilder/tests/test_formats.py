@@ -0,0 +1,106 @@
+import jsonschema
+
+from .. import formats
+from .. import primitives
+from .. import schema
+from .. import utils as jsb_utils
+from . import utils
+
+
+class TestFormats(utils.TestCase):
+
+    def assertFormat(self, format, valid, invalid):
+        for instance in valid:
+            self.assertTrue(
+                formats.checker.conforms(instance, format),
+                "%r should be a valid %s" % (instance, format,)
+            )
+        for instance in invalid:
+            self.assertFalse(
+                formats.checker.conforms(instance, format),
+                "%r should be an invalid %s" % (instance, format,)
+            )
+
+    def test_email(self):
+        self.assertFormat(
+            "email",
+            ["bob@example.com", u"a.b+c@x.co", 1],
+            ["bob", "bob@", "@example.com", "a b@x.com", "bob@-x.com"]
+        )
+
+    def test_uri(self):
+        self.assertFormat(
+            "uri",
+            ["http://example.com/a?b=c#d", "urn:isbn:0451450523",
+             "http://[::1]:80/", "mailto:bob@example.com"],
+            ["example.com", "http://a b", "http://x/%zz", "/a/b"]
+        )
+
+    def test_date_time(self):
+        self.assertFormat(
+            "date-time",
+            ["2024-02-29T10:00:00Z", "2024-01-01 10:00:00.123+02:00",
+             "1990-12-31T23:59:60z"],
+            ["2023-02-29T10:00:00Z", "2024-13-01T10:00:00Z",
+             "2024-01-01T24:00:00Z", "2024-01-01T10:00:00",
+             "2024-01-01"]
+        )
+
+    def test_ip(self):
+        self.assertFormat(
+            "ipv4", ["1.2.3.4", "255.255.255.255"],
+            ["256.1.1.1", "01.2.3.4", "1.2.3", "1.2.3.4\n"]
+        )
+        self.assertFormat(
+            "ipv6", ["::1", u"fe80::1", "2001:db8::8a2e:370:7334"],
+            ["1::2::3", "1.2.3.4", "::g"]
+        )
+
+    def test_hostname(self):
+        self.assertFormat(
+            "hostname", ["example.com", "localhost", "a-b.example.com."],
+            ["-a.com", "a" * 64 + ".com", "ex_ample.com", ""]
+        )
+
+    def test_regex(self):
+        self.assertFormat("regex", ["^a+$"], ["(a"])
+
+    def test_regex_not_cached(self):
+        self.assertTrue(formats.checker.conforms("^b{3}-format$", "regex"))
+        self.assertNotIn("^b{3}-format$", jsb_utils._patterns)
+
+    def test_unknown(self):
+        self.assertIsNone(formats.check("unknown"))
+        self.assertTrue(formats.checker.conforms("a", "unknown"))
+
+    def test_register(self):
+        self.addCleanup(formats.checker.checkers.pop, "even", None)
+
+        @formats.register("even")
+        def is_even(instance):
+            return instance % 2 == 0
+
+        self.assertTrue(formats.checker.conforms(2, "even"))
+        self.assertFalse(primitives.Int(format="even").compile().is_valid(3))
+
+
+class TestSchemaFormats(utils.TestCase):
+
+    def setUp(self):
+        self.schema = schema.Schema()
+        self.email = self.schema.define(
+            "email", primitives.Str(format="email")
+        )
+
+    def test_validate(self):
+        self.email.validate("bob@example.com")
+        self.assertRaises(
+            jsonschema.ValidationError, self.email.validate, "bob"
+        )
+
+    def test_compiled(self):
+        validator = self.schema.compile("email")
+        self.assertTrue(validator.is_valid("bob@example.com"))
+        self.assertEqual(
+            ["format"], [e.validator for e in validator.iter_errors("bob")]
+        )
@@ -1,4 +1,8 @@
+import copy
+import pickle
+
 from .. import primitives
+from .. import utils as jsb_utils
 from . import utils
 
 
@@ -44,6 +48,10 @@ class TestGeneric(utils.TestCase):
             generic.to_dict()
         )
 
+    def test_enum_containers(self):
+        generic = primitives.Generic(enum=[{"a": 1}, [1], 2])
+        self.assertEqual({"enum": [{"a": 1}, [1], 2]}, generic.to_dict())
+
     def test_null_allowed(self):
         generic = primitives.Generic(type="string", null_allowed=True)
         self.assertEqual({
@@ -67,6 +75,87 @@ class TestGeneric(utils.TestCase):
         self.assertIsNone(generic_1.default)
         self.assertEqual("Guest", generic_2.default)
 
+    def test_sparse(self):
+        generic = primitives.Generic(title="Definition")
+        self.assertFalse(hasattr(generic, "__dict__"))
+        self.assertIsNone(generic.description)
+        self.assertRaises(AttributeError, getattr, generic, "min_length")
+        generic.description = "A definition"
+        generic.description = None
+        self.assertNotIn("description", generic._values)
+
+    def test_keywords(self):
+        self.assertEqual("minLength", primitives.Str._keywords["min_length"])
+        self.assertEqual("oneOf", primitives.Str._keywords["one_of"])
+        self.assertNotIn("_required", primitives.Str._keywords)
+        self.assertNotIn("min_length", primitives.Generic._keywords)
+
+    def test_undeclared_property(self):
+        generic = primitives.Generic()
+        generic.x_custom_value = 1
+        self.assertEqual({"xCustomValue": 1}, generic.to_dict())
+
+    def test_pickle(self):
+        o = primitives.Object(properties={"name": primitives.Str(max=3)})
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(
+                o.to_dict(),
+                pickle.loads(pickle.dumps(o, protocol)).to_dict()
+            )
+        self.assertEqual(o.to_dict(), copy.deepcopy(o).to_dict())
+
+    def test_to_dict_cached(self):
+        generic = primitives.Generic(title="Definition")
+        self.assertIs(generic.to_dict(), generic.to_dict())
+
+    def test_to_dict_dirty(self):
+        generic = primitives.Generic(title="Definition")
+        generic.to_dict()
+        generic.title = "User"
+        self.assertEqual({"title": "User"}, generic.to_dict())
+
+    def test_to_dict_dirty_shared_child(self):
+        name = primitives.Str()
+        objects = [
+            primitives.Object(properties={"name": name})
+            for _ in range(jsb_utils.PARENT_REFS_SIZE * 2)
+        ]
+        for o in objects:
+            o.to_dict()
+        name.max_length = 20
+        for o in objects:
+            self.assertEqual(
+                20, o.to_dict()["properties"]["name"]["maxLength"]
+            )
+
+    def test_to_dict_dirty_child(self):
+        name = primitives.Str()
+        o = primitives.Object(properties={"name": name})
+        a = primitives.Array(items=[o])
+        a.to_dict()
+        name.max_length = 20
+        name._required = True
+        self.assertEqual(
+            {
+                "type": "array",
+                "items": [{
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string", "maxLength": 20}
+                    },
+                    "required": ["name"],
+                }],
+            },
+            a.to_dict()
+        )
+
+    def test_copy_to_dict(self):
+        name = primitives.Str()
+        name.to_dict()
+        copy = name(max=20)
+        self.assertEqual({"type": "string"}, name.to_dict())
+        self.assertEqual({"type": "string", "maxLength": 20}, copy.to_dict())
+
 
 class TestStr(utils.TestCase):
 
@@ -95,6 +184,28 @@ class TestStr(utils.TestCase):
             s.to_dict()
         )
 
+    def test_invalid_pattern(self):
+        self.assertRaises(ValueError, primitives.Str, pattern="[a-z")
+        s = primitives.Str(pattern="^a")
+        with self.assertRaises(ValueError):
+            s.pattern = "(a"
+        self.assertEqual("^a", s.pattern)
+
+    def test_pattern_compiled(self):
+        primitives.Str(pattern="^compiled$")
+        self.assertIn("^compiled$", jsb_utils._patterns)
+
+    def test_pattern_cache_bounded(self):
+        size = jsb_utils.PATTERN_CACHE_SIZE
+        jsb_utils.PATTERN_CACHE_SIZE = 8
+        self.addCleanup(setattr, jsb_utils, "PATTERN_CACHE_SIZE", size)
+        jsb_utils.compile_pattern("^recent$")
+        for i in range(len(jsb_utils._patterns) + 16):
+            jsb_utils.compile_pattern("^p%d$" % i)
+            jsb_utils.compile_pattern("^recent$")
+        self.assertLessEqual(len(jsb_utils._patterns), 8)
+        self.assertIn("^recent$", jsb_utils._patterns)
+
     def test_format(self):
         s = primitives.Str(format="email")
         self.assertEqual(
@@ -162,6 +273,12 @@ class TestObject(utils.TestCase):
         o = primitives.Object()
         self.assertEqual({"type": "object"}, o.to_dict())
 
+    def test_invalid_pattern_properties(self):
+        self.assertRaises(
+            ValueError, primitives.Object,
+            pattern_properties={"^x-(": primitives.Str()}
+        )
+
     def test_properties(self):
         o = primitives.Object(properties={'name': primitives.Str()})
         self.assertEqual(
@@ -1,6 +1,14 @@
+import gzip
+import io
+import json
+import threading
+import unittest
+
 import jsonschema
 
+from .. import compiler
 from .. import schema
+from ..schema import asyncio
 from .. import primitives
 from . import utils
 
@@ -99,3 +107,458 @@ class TestSchema(utils.TestCase):
             })
         )
         self.assertRaises(jsonschema.ValidationError, user.validate, {})
+
+    def test_validator_cached(self):
+        s = schema.Schema()
+        name = s.define("name", primitives.Str())
+        name.validate("bob")
+        name.validate("alice")
+        self.assertEqual((1, 1, 1), tuple(s.validator_cache_info()))
+
+    def test_validator_owned(self):
+        s = schema.Schema()
+        s.define("name", primitives.Str())
+        self.assertIsNot(s.validator("name"), s.validator("name"))
+
+    def test_validator_cache_invalidation(self):
+        s = schema.Schema()
+        name = s.define("name", primitives.Str())
+        user = s.define(
+            "user", primitives.Object(properties={"name": name()})
+        )
+        email = s.define("email", primitives.Str())
+        user.validate({"name": "bob"})
+        email.validate("bob@example.com")
+
+        s.define("name", primitives.Int())
+        self.assertEqual(1, s.validator_cache_info().size)
+        email.validate("bob@example.com")
+        self.assertEqual(1, s.validator_cache_info().hits)
+        self.assertRaises(
+            jsonschema.ValidationError, user.validate, {"name": "bob"}
+        )
+
+    def test_validator_cache_invalidation_dangling_ref(self):
+        s = schema.Schema()
+        user = s.define(
+            "user",
+            primitives.Object(properties={"name": s.ref("name")})
+        )
+        self.assertRaises(
+            jsonschema.RefResolutionError, user.validate, {"name": "bob"}
+        )
+        s.define("name", primitives.Str())
+        user.validate({"name": "bob"})
+
+    def test_validate_max_errors(self):
+        s = schema.Schema()
+        names = s.define("names", primitives.Array(items=primitives.Str()))
+        data = range(100)
+
+        with self.assertRaises(jsonschema.ValidationError) as ctx:
+            names.validate(data)
+        self.assertNotIsInstance(ctx.exception, schema.ValidationErrors)
+
+        with self.assertRaises(schema.ValidationErrors) as ctx:
+            names.validate(data, max_errors=3)
+        self.assertEqual(3, len(ctx.exception.errors))
+        self.assertEqual([0], list(ctx.exception.path))
+        self.assertIn("2 more errors", ctx.exception.message)
+
+        with self.assertRaises(schema.ValidationErrors) as ctx:
+            names.validate(data, max_errors=None)
+        self.assertEqual(100, len(ctx.exception.errors))
+
+        names.validate(["bob"], max_errors=None)
+
+        for max_errors in (0, -1):
+            self.assertRaises(
+                ValueError, names.validate, data, max_errors=max_errors
+            )
+
+    def test_validate_many_max_errors(self):
+        s = schema.Schema()
+        s.define("names", primitives.Array(items=primitives.Str()))
+        results = s.validate_many("names", [[1, 2, 3], ["a"]], max_errors=2)
+        self.assertEqual([2, 0], [len(errors) for errors in results])
+
+        for processes in (0, 2):
+            self.assertRaises(
+                ValueError, s.validate_many, "names", [[1]],
+                processes=processes, max_errors=0
+            )
+
+    def test_stats(self):
+        s = schema.Schema()
+        name = s.define("name", primitives.Str(min=2))
+        s.define("email", primitives.Str())
+        name.validate("bob")
+        self.assertRaises(jsonschema.ValidationError, name.validate, "a")
+        list(s.validate_many("name", ["bob", "a", 1]))
+
+        stats = s.stats()
+        self.assertEqual(["email", "name"], sorted(stats))
+        self.assertEqual((0, 0, 0, 0), stats["email"][:4])
+        self.assertEqual((5, 3, 2, 1), stats["name"][:4])
+        self.assertEqual(5, sum(count for _, count in stats["name"].latency))
+        self.assertEqual(float("inf"), stats["name"].latency[-1][0])
+
+    def test_to_dict_cached(self):
+        s = schema.Schema()
+        name = primitives.Str()
+        s.define("name", name)
+        self.assertIs(s.to_dict(), s.to_dict())
+        name.max_length = 3
+        self.assertEqual(
+            {"type": "string", "maxLength": 3},
+            s.to_dict()["definitions"]["name"]
+        )
+
+    def test_to_dict_incremental(self):
+        s = schema.Schema()
+        s.define("tag", {"type": "string"})
+        s.define("name", primitives.Str())
+        before = s.to_dict()
+        s.define("email", primitives.Str(format="email"))
+        after = s.to_dict()
+        self.assertIsNot(before, after)
+        self.assertEqual(["name", "tag"], sorted(before["definitions"]))
+        self.assertEqual(
+            ["email", "name", "tag"], sorted(after["definitions"])
+        )
+        self.assertIs(
+            before["definitions"]["tag"], after["definitions"]["tag"]
+        )
+
+    def test_to_dict_definitions_reset(self):
+        s = schema.Schema()
+        s.define("name", primitives.Str())
+        s.to_dict()
+        s.definitions = {"email": primitives.Str()}
+        self.assertEqual(["email"], sorted(s.to_dict()["definitions"]))
+
+    def test_to_json(self):
+        s = schema.Schema()
+        name = primitives.Str(desc=u"\xe9t\xe9")
+        s.define("name", name)
+        doc = s.to_json()
+        self.assertIs(doc, s.to_json())
+        self.assertIsNone(doc.encoding)
+        self.assertEqual(s.to_dict(), json.loads(doc.data))
+        self.assertIsInstance(doc.data, str)
+        doc.data.decode("ascii")
+
+        other = schema.Schema()
+        other.define("name", primitives.Str(desc=u"\xe9t\xe9"))
+        self.assertEqual(doc.etag, other.to_json().etag)
+
+        name.max_length = 3
+        self.assertNotEqual(doc.etag, s.to_json().etag)
+
+    def test_to_json_mixed_strings(self):
+        s = schema.Schema(desc="caf\xc3\xa9")
+        s.define("name", primitives.Str(desc=u"\xe9t\xe9"))
+        doc = s.to_json()
+        self.assertEqual(
+            u"caf\xe9", json.loads(doc.data)["description"]
+        )
+
+    def test_to_json_gzip(self):
+        s = schema.Schema()
+        s.define("name", primitives.Str())
+        doc = s.to_json(compress=True)
+        self.assertIs(doc, s.to_json(compress=True))
+        self.assertEqual("gzip", doc.encoding)
+        self.assertNotEqual(s.to_json().etag, doc.etag)
+        self.assertEqual(
+            s.to_json().data,
+            gzip.GzipFile(fileobj=io.BytesIO(doc.data)).read()
+        )
+        self.assertEqual(doc.data, schema._gzip(s.to_json().data))
+
+    def test_mutation_invalidates_validators(self):
+        s = schema.Schema()
+        name = primitives.Str()
+        ref = s.define("name", name)
+        s.define("email", primitives.Str())
+        ref.validate("bob")
+        s.ref("email").validate("bob@example.com")
+        self.assertTrue(s.compile("name").is_valid("bob"))
+
+        name.max_length = 2
+        self.assertEqual(1, s.validator_cache_info().size)
+        self.assertRaises(jsonschema.ValidationError, ref.validate, "bob")
+        self.assertFalse(s.compile("name").is_valid("bob"))
+
+    def test_mutation_of_shared_primitive(self):
+        s = schema.Schema()
+        st = primitives.Str()
+        a = s.define("a", primitives.Object(properties={"x": st}))
+        b = s.define("b", primitives.Object(properties={"x": st}))
+        for ref in (a, b):
+            ref.validate({"x": "zz"})
+            self.assertTrue(s.compile(ref._id).is_valid({"x": "zz"}))
+
+        st.pattern = "^a$"
+        for ref in (a, b):
+            self.assertEqual(
+                "^a$",
+                s.to_dict()["definitions"][ref._id]["properties"]["x"][
+                    "pattern"
+                ],
+            )
+            self.assertRaises(
+                jsonschema.ValidationError, ref.validate, {"x": "zz"}
+            )
+            self.assertFalse(s.compile(ref._id).is_valid({"x": "zz"}))
+
+    def test_validate_many(self):
+        s = schema.Schema()
+        s.define("name", primitives.Str(min=2))
+        results = s.validate_many("name", iter(["bob", "a", 1, "alice"]))
+        self.assertEqual(
+            [[], ["minLength"], ["type"], []],
+            [[e.validator for e in errors] for errors in results]
+        )
+        self.assertEqual((0, 1, 1), tuple(s.validator_cache_info()))
+
+    def test_validate_many_lazy(self):
+        s = schema.Schema()
+        s.define("name", primitives.Str())
+
+        def records():
+            yield "bob"
+            raise AssertionError("should not be consumed")
+
+        results = s.validate_many("name", records())
+        self.assertEqual([], next(results))
+        results.close()
+        self.assertEqual(1, s.validator_cache_info().size)
+
+    def test_validate_many_processes(self):
+        s = schema.Schema()
+        name = s.define("name", primitives.Str(min=2))
+        s.define("user", primitives.Object(properties={
+            "name": name(required=True),
+            "tags": primitives.Array(items=primitives.Str()),
+        }))
+        records = [
+            {"name": "bob"},
+            {"name": "a"},
+            {"tags": ["a", 1]},
+            {"name": "alice", "tags": ["a"]},
+            {"name": 1},
+        ] * 3
+        results = list(s.validate_many(
+            "user", iter(records), processes=2, chunk_size=2
+        ))
+        self.assertEqual(
+            [
+                [(e.message, list(e.path), e.instance) for e in errors]
+                for errors in s.validate_many("user", records)
+            ],
+            [
+                [(e.message, list(e.path), e.instance) for e in errors]
+                for errors in results
+            ],
+        )
+
+
+class TestThreadSafety(utils.TestCase):
+
+    threads = 16
+    rounds = 200
+
+    def setUp(self):
+        self.schema = schema.Schema()
+        name = self.schema.define("name", primitives.Str(min=1))
+        tag = self.schema.define("tag", primitives.Str(pattern="^[a-z]+$"))
+        self.user = self.schema.define(
+            "user",
+            primitives.Object(properties={
+                "name": name(required=True),
+                "tags": primitives.Array(items=tag()),
+            })
+        )
+
+    def run_threads(self, target):
+        failures = []
+
+        def run(n):
+            try:
+                target(n)
+            except Exception as e:
+                failures.append(e)
+
+        threads = [
+            threading.Thread(target=run, args=(n,))
+            for n in range(self.threads)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([], failures)
+
+    def test_ref_validate(self):
+        def target(n):
+            for i in range(self.rounds):
+                self.user.validate({"name": "bob", "tags": ["a", "b"]})
+                self.assertRaises(
+                    jsonschema.ValidationError,
+                    self.user.validate,
+                    {"name": "bob", "tags": ["a", str(i)]}
+                )
+
+        self.run_threads(target)
+        self.assertLessEqual(
+            self.schema.validator_cache_info().misses, self.threads
+        )
+
+        stats = self.schema.stats()["user"]
+        self.assertEqual(2 * self.threads * self.rounds, stats.validations)
+        self.assertEqual(self.threads * self.rounds, stats.failures)
+        self.assertEqual(
+            stats.validations, stats.cache_hits + stats.cache_misses
+        )
+        self.assertEqual(
+            stats.validations, sum(count for _, count in stats.latency)
+        )
+
+    def test_first_validation_after_defines(self):
+        for trial in range(5):
+            s = schema.Schema()
+            for i in range(2000):
+                name = s.define("d%d" % i, primitives.Str(min=1))
+            user = s.define("user", primitives.Object(properties={
+                "name": name(required=True),
+            }))
+            ready = threading.Semaphore(0)
+            start = threading.Event()
+
+            def target(n):
+                ready.release()
+                start.wait()
+                user.validate({"name": "bob"})
+                self.assertEqual(2001, len(s.to_dict()["definitions"]))
+
+            def release():
+                for _ in range(self.threads):
+                    ready.acquire()
+                start.set()
+
+            starter = threading.Thread(target=release)
+            starter.start()
+            self.run_threads(target)
+            starter.join()
+
+    def test_compiled(self):
+        validator = self.schema.compile("user")
+
+        def target(n):
+            for i in range(self.rounds):
+                self.assertTrue(validator.is_valid({"name": "bob"}))
+                self.assertFalse(
+                    validator.is_valid({"name": "bob", "tags": [str(i)]})
+                )
+
+        self.run_threads(target)
+
+
+class TestProfiling(utils.TestCase):
+
+    def setUp(self):
+        self.schema = schema.Schema()
+        name = self.schema.define("name", primitives.Str(pattern="^[a-z]+$"))
+        self.user = self.schema.define("user", primitives.Object(
+            properties={"name": name(required=True)}
+        ))
+
+    def test_disabled(self):
+        self.user.validate({"name": "bob"})
+        self.assertIs(
+            compiler.Draft4Validator, type(self.schema.validator("user"))
+        )
+        self.assertIsNone(self.schema.disable_profiling())
+
+    def test_profile(self):
+        self.user.validate({"name": "bob"})
+        profile = self.schema.enable_profiling()
+        self.user.validate({"name": "bob"})
+        self.assertRaises(
+            jsonschema.ValidationError, self.user.validate, {"name": "Bob"}
+        )
+
+        stats = profile.as_dict()
+        self.assertEqual(2, stats["definition"]["user"]["calls"])
+        self.assertEqual(2, stats["definition"]["name"]["calls"])
+        self.assertEqual(2, stats["keyword"]["pattern"]["calls"])
+        self.assertGreaterEqual(
+            stats["definition"]["user"]["time"],
+            stats["definition"]["name"]["time"]
+        )
+
+        self.assertIs(profile, self.schema.disable_profiling())
+        self.user.validate({"name": "bob"})
+        self.assertEqual(
+            2, profile.as_dict()["definition"]["user"]["calls"]
+        )
+
+    def test_profile_pointer(self):
+        profile = self.schema.enable_profiling()
+        nick = self.schema.define(
+            "nick", {"$ref": "#/definitions/user/properties/name"}
+        )
+        nick.validate("bob")
+        definitions = profile.as_dict()["definition"]
+        self.assertEqual(1, definitions["user"]["calls"])
+        self.assertNotIn("user/properties/name", definitions)
+
+    def test_profile_max_errors(self):
+        profile = self.schema.enable_profiling()
+        names = self.schema.define(
+            "names", primitives.Array(items=self.schema.ref("name"))
+        )
+        with self.assertRaises(jsonschema.ValidationError):
+            names.validate(["Bob"] * 10)
+        self.assertEqual(1, profile.as_dict()["definition"]["name"]["calls"])
+
+    def test_callback(self):
+        calls = []
+        self.schema.enable_profiling(
+            lambda kind, name, duration: calls.append((kind, name,))
+        )
+        self.schema.ref("name").validate("bob")
+        self.assertIn(("definition", "name"), calls)
+        self.assertIn(("keyword", "type"), calls)
+
+
+@unittest.skipIf(asyncio is None, "asyncio (or trollius) is not installed")
+class TestAsync(utils.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.schema = schema.Schema()
+        self.name = self.schema.define("name", primitives.Str(min=2))
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_validate_async(self):
+        future = self.name.validate_async("bob", loop=self.loop)
+        self.assertIsNone(self.loop.run_until_complete(future))
+
+    def test_validate_async_fails(self):
+        future = self.name.validate_async("a", loop=self.loop)
+        self.assertRaises(
+            jsonschema.ValidationError,
+            self.loop.run_until_complete,
+            future
+        )
+
+    def test_validate_many_async(self):
+        future = self.schema.validate_many_async(
+            "name", ["bob", "a"], loop=self.loop
+        )
+        results = self.loop.run_until_complete(future)
+        self.assertEqual([0, 1], [len(errors) for errors in results])
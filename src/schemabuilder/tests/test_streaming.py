@@ -0,0 +1,115 @@
+import io
+import json
+
+from .. import primitives
+from .. import schema
+from .. import streaming
+from . import utils
+
+
+class TestIterArray(utils.TestCase):
+
+    def test_empty(self):
+        self.assertEqual([], list(streaming.iter_array([" [ ] "])))
+
+    def test_chunks(self):
+        doc = json.dumps([
+            1, 23.5, "a,]", {"b": [True, None]}, [], -456,
+            {"c": [u"\u00e9t\u00e9", False]},
+        ])
+        for size in (1, 2, 3, 7, 100):
+            chunks = [doc[i:i + size] for i in range(0, len(doc), size)]
+            self.assertEqual(
+                json.loads(doc), list(streaming.iter_array(chunks))
+            )
+
+    def test_file(self):
+        doc = u'[\n"\u00e9t\u00e9",\n2\n]\n'
+        stream = io.BytesIO(doc.encode("utf-8"))
+        self.assertEqual(
+            [u"\u00e9t\u00e9", 2],
+            list(streaming.iter_array(stream, chunk_size=1))
+        )
+
+    def test_lazy(self):
+        def chunks():
+            yield "[1, 2"
+            yield ", 3"
+            raise AssertionError("should not be consumed")
+
+        items = streaming.iter_array(chunks())
+        self.assertEqual(1, next(items))
+        self.assertEqual(2, next(items))
+
+    def test_malformed(self):
+        for doc in ("", "{}", "[1", "[1 2]", "[1,]", "[1] 2"):
+            self.assertRaises(
+                ValueError, list, streaming.iter_array([doc])
+            )
+
+    def test_malformed_item(self):
+        consumed = []
+
+        def chunks():
+            yield '[{"a": tru'
+            yield 'x}'
+            for i in range(10000):
+                consumed.append(i)
+                yield ', {"a": true}'
+
+        self.assertRaises(ValueError, list, streaming.iter_array(chunks()))
+        self.assertLess(len(consumed), 2)
+
+
+class TestValidateStream(utils.TestCase):
+
+    def setUp(self):
+        self.schema = schema.Schema()
+        name = self.schema.define("name", primitives.Str(min=2))
+        self.schema.define(
+            "names", primitives.Array(items=name(), min=1, max=3, is_set=True)
+        )
+
+    def errors(self, doc):
+        return [
+            (e.validator, list(e.path),)
+            for e in self.schema.validate_stream("names", io.BytesIO(doc))
+        ]
+
+    def test_valid(self):
+        self.assertEqual([], self.errors('["bob", "alice"]'))
+
+    def test_items(self):
+        self.assertEqual(
+            [("minLength", [1]), ("type", [2])],
+            self.errors('["bob", "a", 1]')
+        )
+
+    def test_size(self):
+        self.assertEqual([("minItems", [])], self.errors('[]'))
+        self.assertEqual(
+            [("maxItems", [])], self.errors('["ab", "cd", "ef", "gh"]')
+        )
+
+    def test_unique(self):
+        self.assertEqual(
+            [("uniqueItems", [2])], self.errors('["ab", "cd", "ab"]')
+        )
+
+    def test_tuple(self):
+        self.schema.define("pair", primitives.Array(
+            items=(primitives.Str(), primitives.Int()),
+            additional_items=False
+        ))
+        errors = self.schema.validate_stream(
+            "pair", io.BytesIO('["a", "b", 3]')
+        )
+        self.assertEqual(
+            [("type", [1]), ("additionalItems", [2])],
+            [(e.validator, list(e.path),) for e in errors]
+        )
+
+    def test_not_an_array(self):
+        self.assertRaises(
+            TypeError, self.schema.validate_stream, "name", io.BytesIO("[]")
+        )
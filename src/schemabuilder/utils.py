@@ -1,4 +1,107 @@
 import collections
+import copy_reg
+import itertools
+import re
+import threading
+import urllib
+import weakref
+
+
+_PROXIES = (weakref.ProxyType, weakref.CallableProxyType,)
+
+#: maximum number of compiled patterns kept by :func:`compile_pattern`.
+PATTERN_CACHE_SIZE = 4096
+
+#: number of parents an object keeps in a tuple of weak references; see
+#: :meth:`ToDictMixin._adopt`.
+PARENT_REFS_SIZE = 8
+
+_patterns = {}
+_patterns_lock = threading.Lock()
+_ticks = itertools.count()
+
+
+def compile_pattern(pattern):
+    """Return the compiled regex of a pattern.
+
+    Compiled patterns are kept in a process wide cache, shared by all
+    schemas and bounded to :data:`PATTERN_CACHE_SIZE` entries. When it's
+    full, the least recently used quarter of the patterns are dropped.
+    Cache hits don't take any lock.
+
+    :raise ValueError: if the pattern is not a valid regex.
+
+    """
+    entry = _patterns.get(pattern)
+    if entry is not None:
+        entry[1] = next(_ticks)
+        return entry[0]
+
+    try:
+        regex = re.compile(pattern)
+    except (re.error, TypeError) as e:
+        raise ValueError("Invalid pattern %r: %s" % (pattern, e,))
+
+    with _patterns_lock:
+        if len(_patterns) >= PATTERN_CACHE_SIZE:
+            entries = sorted(_patterns.items(), key=lambda i: i[1][1])
+            for key, _ in entries[:max(1, len(entries) // 4)]:
+                del _patterns[key]
+        _patterns[pattern] = [regex, next(_ticks)]
+    return regex
+
+
+class Lock(object):
+    """A lock which is copied, or unpickled, as a new lock.
+
+    Lets objects holding a lock be copied like the other objects.
+
+    """
+    __slots__ = ("_lock",)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        return (self.__class__, ())
+
+    def __enter__(self):
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._lock.__exit__(*exc_info)
+
+
+#: prefix of the references to schema definitions.
+DEF_PREFIX = "#/definitions/"
+
+
+def definition_path(ref):
+    """Split a `#/definitions/...` reference into the unescaped segments
+    of its JSON pointer.
+
+    The first segment is the id of the definition; e.g.
+    `#/definitions/a/properties/x` gives `["a", "properties", "x"]`.
+
+    """
+    pointer = urllib.unquote(ref[len(DEF_PREFIX):])
+    return [
+        segment.replace("~1", "/").replace("~0", "~")
+        for segment in pointer.split("/")
+    ]
+
+
+def check_max_errors(max_errors):
+    """Check a `max_errors` argument is None or a positive integer.
+
+    :raise ValueError: if `max_errors` would stop before any error, and
+                       accept invalid data.
+
+    """
+    if max_errors is not None and max_errors < 1:
+        raise ValueError(
+            "max_errors must be None or at least 1, got %r" % (max_errors,)
+        )
 
 
 def _to_camel_case(s):
@@ -8,31 +111,209 @@ def _to_camel_case(s):
     return s[0] + s.title().replace("_", "")[1:]
 
 
+_keywords = {}
+
+
+def _keyword(name):
+    """Return the (memoized) keyword of an attribute not declared in a
+    `_fields` table.
+
+    """
+    keyword = _keywords.get(name)
+    if keyword is None:
+        keyword = _keywords[name] = _to_camel_case(name)
+    return keyword
+
+
+class _ToDictMeta(type):
+    """Build the class attribute tables from the `_fields` declared by
+    the class and its bases.
+
+    """
+
+    def __init__(cls, name, bases, attrs):
+        super(_ToDictMeta, cls).__init__(name, bases, attrs)
+        fields = set()
+        for klass in cls.__mro__:
+            fields.update(klass.__dict__.get("_fields", ()))
+        cls._field_set = frozenset(fields)
+        cls._keywords = {
+            f: _to_camel_case(f) for f in fields if not f.startswith("_")
+        }
+
+
 class ToDictMixin(object):
     """Convert the object properties to a dictionary.
 
     Recursively walks the dict and sequences properties to convert them.
 
+    The dictionary is cached until an attribute of the object, or of an
+    object it holds, is set. Objects held in dict or sequence attributes
+    are tracked too, but changing those containers in place is not: the
+    attribute should be set again instead.
+
     """
+    __metaclass__ = _ToDictMeta
+    __slots__ = ("_dict_cache", "_parents", "__weakref__",)
+
+    #: attributes not affecting the dictionary.
+    _untracked = frozenset()
+
+    #: attributes declared by the class; the metaclass maps the public
+    #: ones to their JSON keyword in `_keywords`.
+    _fields = ()
+
+    def __new__(cls, *args, **kw):
+        self = super(ToDictMixin, cls).__new__(cls)
+        object.__setattr__(self, "_dict_cache", None)
+        object.__setattr__(self, "_parents", ())
+        return self
+
+    def __setattr__(self, name, value):
+        self._set_property(name, value)
+        if name in self._untracked:
+            return
+        if isinstance(value, (dict, list, tuple, ToDictMixin,)):
+            self._adopt(value)
+        # nothing is cached yet while the object is being built.
+        if self._parents or self._dict_cache is not None:
+            self._touch()
+
+    def __reduce_ex__(self, protocol):
+        return (copy_reg.__newobj__, (type(self),), self.__getstate__())
+
+    def __getstate__(self):
+        return dict(self._properties())
+
+    def __setstate__(self, state):
+        self._load_properties(state)
+        for name, value in state.iteritems():
+            if name not in self._untracked:
+                self._adopt(value)
+
+    def __copy__(self):
+        clone = self.__class__.__new__(self.__class__)
+        clone.__setstate__(self.__getstate__())
+        return clone
+
     def to_dict(self):
         """Return the schema as a `dict`, ready to be serialized by
         :mod:`json`.
 
+        The dictionary is cached and shared; it should not be modified.
+
+        """
+        result = self._dict_cache
+        if result is None:
+            result = self._to_dict()
+            object.__setattr__(self, "_dict_cache", result)
+        return result
+
+    def _properties(self):
+        """Return the dict holding the object properties.
+
+        """
+        return self.__dict__
+
+    def _set_property(self, name, value):
+        object.__setattr__(self, name, value)
+
+    def _load_properties(self, properties):
+        self.__dict__.update(properties)
+
+    def _adopt(self, value):
+        """Register the object as parent of the objects `value` holds.
+
+        Parents are kept as a tuple of weak references; most objects
+        have one or two. Objects shared by more than
+        :data:`PARENT_REFS_SIZE` parents switch to a
+        :class:`weakref.WeakSet`, so adding a parent stays O(1).
+
+        """
+        stack = [value]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                stack.extend(value.itervalues())
+            elif isinstance(value, (list, tuple,)):
+                stack.extend(value)
+            elif (
+                isinstance(value, ToDictMixin) and
+                type(value) not in _PROXIES
+            ):
+                parents = value._parents
+                if isinstance(parents, weakref.WeakSet):
+                    parents.add(self)
+                    continue
+                if any(ref() is self for ref in parents):
+                    continue
+                parents = tuple(
+                    ref for ref in parents if ref() is not None
+                ) + (weakref.ref(self),)
+                if len(parents) > PARENT_REFS_SIZE:
+                    parents = weakref.WeakSet(
+                        node for node in (ref() for ref in parents)
+                        if node is not None
+                    )
+                object.__setattr__(value, "_parents", parents)
+
+    def _touch(self):
+        """Drop the cached dict of the object and of its ancestors.
+
+        Each ancestor is told about every one of its children the change
+        went through, but its own ancestors are only visited once.
+
+        """
+        edges = set()
+        visited = set()
+        stack = [(self, None,)]
+        while stack:
+            node, child = stack.pop()
+            if node is None or (id(node), id(child)) in edges:
+                continue
+            edges.add((id(node), id(child)))
+            node._changed(child)
+            if id(node) in visited:
+                continue
+            visited.add(id(node))
+            parents = node._parents
+            if isinstance(parents, weakref.WeakSet):
+                stack.extend((parent, node,) for parent in list(parents))
+            else:
+                stack.extend((ref(), node,) for ref in parents)
+
+    def _changed(self, child):
+        """Called when the object, or `child` one of the objects it
+        holds, changed.
+
+        """
+        object.__setattr__(self, "_dict_cache", None)
+
+    def _to_dict(self):
+        keywords = self._keywords
+        return self._serialize(
+            {
+                keywords.get(k) or _keyword(k): v
+                for k, v in self._properties().iteritems()
+                if k[0] != "_"
+            }
+        )
+
+    @classmethod
+    def _serialize(cls, source):
+        """Convert a dict of properties, skipping None values and
+        private properties.
+
         """
         result = {}
         stack = collections.deque()
-        stack.append(
-            (
-                result,
-                {_to_camel_case(k): v for k, v in self.__dict__.iteritems()},
-            )
-        )
+        stack.append((result, source,))
         while stack:
             dest, source = stack.pop()
             if isinstance(dest, dict):
-                self._process_dict(dest, source, stack)
+                cls._process_dict(dest, source, stack)
             else:
-                self._process_list(dest, source, stack)
+                cls._process_list(dest, source, stack)
         return result
 
     @staticmethod
@@ -60,7 +341,7 @@ class ToDictMixin(object):
             if isinstance(v, dict):
                 dest.append({})
                 stack.append((dest[-1], v,))
-            if isinstance(v, (list, tuple,)):
+            elif isinstance(v, (list, tuple,)):
                 dest.append([])
                 stack.append((dest[-1], v,))
             elif hasattr(v, "to_dict"):